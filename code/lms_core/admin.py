@@ -1,5 +1,6 @@
 from django.contrib import admin
 from lms_core.models import Course
+from lms_core.search import matching_ids
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
@@ -7,4 +8,10 @@ class CourseAdmin(admin.ModelAdmin):
     list_filter = ["teacher"]
     search_fields = ["name", "description"]
     readonly_fields = ["created_at", "updated_at"]
-    fields = ["name", "description", "price", "image", "teacher", "created_at", "updated_at"]
\ No newline at end of file
+    fields = ["name", "description", "price", "image", "teacher", "created_at", "updated_at"]
+
+    def get_search_results(self, request, queryset, search_term):
+        # The search index instead of an icontains scan over both columns
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids("course", search_term)), False
@@ -1,23 +1,41 @@
-from ninja import NinjaAPI, UploadedFile, File, Form, Router
+from ninja import NinjaAPI, UploadedFile, File, Form, Router, Query
+from ninja.errors import HttpError
+from ninja.decorators import decorate_view
 from ninja.security import HttpBearer, HttpBasicAuth
 from ninja.responses import Response
 from lms_core.schema import CourseSchemaOut, CourseMemberOut, CourseMemberIn, CourseSchemaIn
-from lms_core.schema import CourseContentIn, CourseContentMini, CourseContentFull
+from lms_core.schema import CourseContentIn, CourseContentMini, CourseContentFull, CourseContentNode
 from lms_core.schema import CourseCommentOut, CourseCommentIn
 from lms_core.schema import FeedbackOut, FeedbackIn
+from lms_core.schema import SearchPage
 from lms_core.schema import UserOut, UserIn
 from lms_core.schema import TokenResponse, TokenRequest
-from lms_core.models import Course, CourseMember, CourseContent, CourseLimit, Comment, Feedback
+from lms_core.models import Course, CourseMember, CourseContent, CourseLimit, Comment, Feedback, CourseStats
+from lms_core.models import SEARCH_KIND_OPTIONS
 from ninja_simple_jwt.auth.views.api import mobile_auth_router
 from ninja_simple_jwt.auth.ninja_auth import HttpJwtAuth
 from ninja.pagination import paginate, PageNumberPagination
+from lms_core.pagination import CursorPagination
+from lms_core.query_planner import plan_queries
+from lms_core.streaming import stream_page, stream_rows, stream_queryset, streamable, wants_ndjson, chunked, STREAM_CHUNK_SIZE
+from lms_core.stats import auser_dashboard_counts
+from lms_core.enrollment import enroll, bulk_enroll, EnrollmentError
+from lms_core.response_cache import cached_response, table_etag
+from lms_core.renderers import flat_response
+from lms_core.fieldsets import sparse_fieldsets, parse_paths
+from lms_core.images import enqueue_variants, variant_urls
+from lms_core.content_tree import content_tree
+from lms_core.search import search
+from lms_core.sync import sync
+from lms_core.routers import read_from_replica
 from django.shortcuts import get_object_or_404
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
 from lms_core.models import User
+from lms_core.token_cache import token_cache
 from django.http import JsonResponse
 from typing import Optional
-from ninja.throttling import AnonRateThrottle, UserRateThrottle
+from lms_core.throttling import AnonRateThrottle, UserRateThrottle
 from ninja.security import HttpBearer
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.contrib.auth.models import AnonymousUser
@@ -29,7 +47,26 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 class GlobalAuth(HttpBearer):
     def authenticate(self, request, token: str):
-        user = User.objects.filter(auth_token=token).first()
+        user = token_cache.get(token)
+        if user is None:
+            user = User.objects.filter(auth_token=token).first()
+            if user:
+                token_cache.set(token, user)
+        if not user:
+             user = AnonymousUser()
+        request.user = user
+        return user
+
+class AsyncGlobalAuth(GlobalAuth):
+    # Used by the async handlers, where a sync ORM call is not allowed
+    is_async = True
+
+    async def authenticate(self, request, token: str):
+        user = await token_cache.aget(token)
+        if user is None:
+            user = await User.objects.filter(auth_token=token).afirst()
+            if user:
+                await token_cache.aset(token, user)
         if not user:
              user = AnonymousUser()
         request.user = user
@@ -76,12 +113,19 @@ def sign_in(request, payload: TokenRequest):
     user.auth_token = token
     user.save()
 
+    token_cache.set(token.key, user)
+
     return {
         "token": token.key
     }
 
 # Get everything
 @router.get("/users/", auth=None, response=list[UserOut], tags=["list"])
+@decorate_view(read_from_replica)
+@decorate_view(table_etag(User))
+@sparse_fieldsets(UserOut, ordering=("-date_joined", "-id"))
+@streamable(UserOut)
+@paginate(CursorPagination, ordering=("-date_joined", "-id"))
 def get_users(request):
     try:
         users = User.objects.all()
@@ -90,16 +134,33 @@ def get_users(request):
         return { "message": "Failed to get users" }
 
 @router.get("/courses/", auth=None, response=list[CourseSchemaOut], tags=["list"])
-def get_courses(request):
+@decorate_view(read_from_replica)
+@decorate_view(cached_response("courses"))
+@sparse_fieldsets(CourseSchemaOut)
+@paginate(CursorPagination)
+@plan_queries(CourseSchemaOut)
+async def get_courses(request):
     courses = Course.objects.all()
     return courses
 
 @router.get("/comments/", auth=None, response=list[CourseCommentOut], tags=["list"])
+@decorate_view(read_from_replica)
+@decorate_view(table_etag(Comment, CourseContent, Course, User))
+@sparse_fieldsets(CourseCommentOut)
+@streamable(CourseCommentOut)
+@paginate(CursorPagination)
+@plan_queries(CourseCommentOut)
 def get_comments(request):
     comments = Comment.objects.all()
     return comments
 
 @router.get("/feedbacks/", auth=None, response=list[FeedbackOut], tags=["list"])
+@decorate_view(read_from_replica)
+@decorate_view(table_etag(Feedback))
+@flat_response(FeedbackOut)
+@sparse_fieldsets(FeedbackOut)
+@streamable(FeedbackOut)
+@paginate(CursorPagination)
 def get_feedbacks(request):
     try:
         feedbacks = Feedback.objects.all()
@@ -108,6 +169,11 @@ def get_feedbacks(request):
         return { "message": "Failed to get feedbacks" }
 
 @router.get("/members/", auth=None, response=list[CourseMemberOut], tags=["list"])
+@decorate_view(read_from_replica)
+@decorate_view(table_etag(CourseMember, Course, User))
+@sparse_fieldsets(CourseMemberOut)
+@paginate(CursorPagination)
+@plan_queries(CourseMemberOut)
 def get_members(request):
     try:
         members = CourseMember.objects.all()
@@ -116,15 +182,47 @@ def get_members(request):
         return { "message": "Failed to get members" }
 
 @router.get("/contents/", auth=None, response=list[CourseContentMini], tags=["list"])
-def get_contents(request):
+@decorate_view(read_from_replica)
+@decorate_view(cached_response("contents"))
+@sparse_fieldsets(CourseContentMini)
+@paginate(CursorPagination)
+@plan_queries(CourseContentMini)
+async def get_contents(request):
     try:
         contents = CourseContent.objects.all()
         return contents
     except:
         return { "message": "Failed to get contents" }
 
-@router.get("/whoami/", tags=["authorization"])
-def whoami(request):
+# Content outline of a course, or the subtree under ?root=, nested in one query
+@router.get("/courses/{course_id}/content-tree/", auth=None, response=list[CourseContentNode], tags=["list"])
+@decorate_view(read_from_replica)
+@decorate_view(cached_response("contents"))
+def get_content_tree(request, course_id: int, root: Optional[int] = None, depth: Optional[int] = None):
+    tree = content_tree(course_id, root, depth)
+    if root is not None and not tree:
+        raise HttpError(404, "Content not found in this course")
+    return tree
+
+# Full-text search, best match first; kind=course,content,comment narrows it
+@router.get("/search/", auth=None, response=SearchPage, tags=["list"])
+@decorate_view(read_from_replica)
+def search_all(request, q: str, pagination: Query[CursorPagination.Input],
+               kind: Optional[str] = None, course_id: Optional[int] = None):
+    kinds = [name.strip() for name in (kind or "").split(",") if name.strip()]
+    unknown = set(kinds) - {name for name, _ in SEARCH_KIND_OPTIONS}
+    if unknown:
+        raise HttpError(400, f"Unknown kind: {', '.join(sorted(unknown))}")
+
+    return search(q, pagination, kinds, course_id)
+
+# Incremental sync for mobile clients: pass the last watermark as ?since=
+@router.get("/sync/", auth=None, tags=["list"])
+def sync_changes(request, since: Optional[str] = None):
+    return sync(since)
+
+@router.get("/whoami/", auth=AsyncGlobalAuth(), tags=["authorization"])
+async def whoami(request):
     if request.user:
         return { "authenticated": request.user.is_authenticated,
                 "username": request.user.username, "firstname": request.user.first_name,
@@ -135,20 +233,18 @@ def whoami(request):
 
 
 # Dashboard (+)
-@router.get("/user/dashboard/", tags=["points"])
-def get_user_dashboard(request):
+@router.get("/user/dashboard/", auth=AsyncGlobalAuth(), tags=["points"])
+async def get_user_dashboard(request):
 
     try:
         user = request.user
-        course_member = CourseMember.objects.filter(user_id=user)
-        course = Course.objects.filter(teacher=user)
-        comment = Comment.objects.filter(member_id=user)
+        counts = await auser_dashboard_counts(user.id)
 
         return {
             "user": user.username,
-            "course_followed_count": course_member.count(),
-            "course_created_count": course.count(),
-            "comment_count": comment.count(),
+            "course_followed_count": counts["course_followed_count"],
+            "course_created_count": counts["course_created_count"],
+            "comment_count": counts["comment_count"],
         }
 
     except User.DoesNotExist:
@@ -156,24 +252,22 @@ def get_user_dashboard(request):
 
 # Course Stats (+)
 @router.get("/course/{course_id}/stats/", auth=None, tags=["points"])
-def get_course_statistics(request, course_id: int):
+@decorate_view(read_from_replica)
+@decorate_view(cached_response("course_stats"))
+async def get_course_statistics(request, course_id: int):
 
     try:
-        course = Course.objects.get(id=course_id)
-        course_member = CourseMember.objects.filter(course_id=course)
-        course_content = CourseContent.objects.filter(course_id=course)
-        comment = Comment.objects.filter(content_id__in=course_content)
-        feedback = Feedback.objects.filter(course_id=course)
+        stats = await CourseStats.objects.aget(course_id=course_id)
 
         return {
-            "course_member_count": course_member.count(),
-            "course_content_count": course_content.count(),
-            "course_comment_count": comment.count(),
-            "course_feedback_count": feedback.count()
+            "course_member_count": stats.member_count,
+            "course_content_count": stats.content_count,
+            "course_comment_count": stats.comment_count,
+            "course_feedback_count": stats.feedback_count
         }
 
-    except User.DoesNotExist:
-        return { "message": "User does not exist!" }
+    except CourseStats.DoesNotExist:
+        return { "message": "Course does not exist!" }
 
 # Feedback (+)(+)(+)(+)
 @router.post("/feedback/", tags=["feedback", "points"])
@@ -198,14 +292,14 @@ def add_feedback(request, course_id: int, feedback: str):
         return { "message": "Failed to create feedback" }
 
 @router.get("/feedback/{course_id}/", auth=None, tags=["feedback", "points"])
+@decorate_view(read_from_replica)
 def show_feedback(request, course_id: int):
 
     try:
         course = Course.objects.get(id=course_id)
         feedback = Feedback.objects.filter(course_id=course).values()
 
-        data = list(feedback)
-        return JsonResponse(data, safe=False)
+        return stream_queryset(request, feedback)
     except:
         return { "message": "Failed to show feedback" }
 
@@ -250,36 +344,15 @@ def delete_feedback(request, feedback_id: int):
 def enroll_course(request, course_id: int, student_id: int):
 
     try:
-        course = get_object_or_404(Course, id=course_id)
-
-        user = User.objects.get(id=student_id)
-
-        all_member = CourseMember.objects.filter(course_id=course)
-        member = CourseMember.objects.filter(course_id=course, user_id=user)
-
-        if course.teacher != request.user:
-            return { "message": f"Only the course creator has the authority to enroll students." }
-        elif member.exists():
-            return { "message": f"User {request.user.username} already enrolled in this course" }
-        else:
-            teacher = course.teacher
-
-            try:
-                limit = CourseLimit.objects.get(course_id=course)
-            except CourseLimit.DoesNotExist:
-                limit = None
-
-            if not limit or all_member.count() < limit.limit:
-                student = User.objects.get(id=student_id)
-                new_member = CourseMember.objects.create(course_id=course, user_id=student)
-                return {
-                    "id": new_member.id,
-                    "course_id": new_member.course_id.id,
-                    "user_id": new_member.user_id.id,
-                    "roles": new_member.roles
-                }
-            else:
-                return { "message": f"Course is full" }
+        new_member = enroll(course_id, student_id, request.user.id)
+        return {
+            "id": new_member.id,
+            "course_id": new_member.course_id_id,
+            "user_id": new_member.user_id_id,
+            "roles": new_member.roles
+        }
+    except EnrollmentError as e:
+        return { "message": e.message }
     except:
         return { "message": "Failed to enroll student" }
 
@@ -287,20 +360,15 @@ def enroll_course(request, course_id: int, student_id: int):
 @router.post("/courses/batch_enroll/", tags=["points"])
 def batch_enroll_course(request, payload: list[CourseMemberIn]):
 
-    results = []
-
     try:
-        for entry in payload:
-            course_id = entry.course_id
-            user_id = entry.user_id
-
-            results.append(enroll_course(request, course_id, user_id))
+        entries = [(entry.course_id, entry.user_id) for entry in payload]
+        results = bulk_enroll(entries, request.user.id)
 
         return JsonResponse(results, safe=False)
     except:
         return { "message": "Failed to batch enroll student" }
 
-@router.post("/courses/{course_id}/{limit}/")
+@router.post("/courses/{int:course_id}/{int:limit}/")
 def course_set_limit(request, course_id: int, limit: int):
 
     try:
@@ -311,13 +379,14 @@ def course_set_limit(request, course_id: int, limit: int):
         if user != teacher:
             return { "message": "Only the creator of this course can make changes." }
 
-        course_limit, created = CourseLimit.objects.update_or_create(course_id=course, teacher_id=teacher, limit=limit)
+        course_limit, created = CourseLimit.objects.update_or_create(course_id=course, defaults={ "teacher_id": teacher, "limit": limit })
 
         return { "message": "Limit set successfully" if created else "Limit updated successfully" }
     except:
         return { "message": "Failed to set course limit" }
 
 @router.get("/courses/{course_id}/limit/", auth=None)
+@decorate_view(cached_response("course_limit"))
 def course_show_limit(request, course_id: int):
 
     try:
@@ -362,6 +431,8 @@ def create_course(request, payload: CourseSchemaIn, image: UploadedFile = File(N
             image=image,
             teacher=user
         )
+        # Thumbnails are made in the background, see lms_core.images
+        enqueue_variants(course, "image")
 
         return course
     except:
@@ -371,22 +442,25 @@ def create_course(request, payload: CourseSchemaIn, image: UploadedFile = File(N
 @router.post("/contents/",  throttle=[UserRateThrottle("10/h")], tags=["points"])
 def create_content(request, payload: CourseContentIn, image: UploadedFile = File(None)):
 
-    # try:
+    try:
         user_id = request.user.id
         user = User.objects.get(id=user_id)
         course = Course.objects.get(id=payload.course_id)
 
+        parent = None
+        if payload.parent_id is not None:
+            parent = CourseContent.objects.filter(id=payload.parent_id, course_id=course).first()
+            if parent is None:
+                return { "message": "Parent content must belong to the same course" }
+
         content = CourseContent.objects.create(
             name=payload.name,
             description=payload.description,
             video_url=payload.video_url,
             course_id=course,
+            parent_id=parent,
         )
 
-        if payload.parent_id is not None:
-            content.parent_id = payload.parent_id
-            content.save()
-
         return { "response": content.id}
     except:
         return { "message": "Failed to create content" }
@@ -414,32 +488,82 @@ def post_comment(request, content_id: int, comment: str):
         return { "message": "Failed to post comment" }
 
 # Profiles (+)
-@router.get("/profiles/", auth=None, tags=["profile", "points"])
-def list_profiles(request):
+PROFILE_FIELDS = ["id", "first_name", "last_name", "email", "phone_number", "description",
+                  "profile_image", "profile_image_variants", "course_created", "course_followed"]
 
-    results = []
+@router.get("/profiles/", auth=None, tags=["profile", "points"])
+@decorate_view(table_etag(User, Course, CourseMember))
+def list_profiles(request, pagination: Query[CursorPagination.Input], fields: Optional[str] = None):
 
     try:
-        users = User.objects.all()
-
-        for user in users:
-            courses = Course.objects.filter(teacher=user)
-            members = CourseMember.objects.filter(user_id=user)
-
-            results.append({
-                "id": user.id,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "email": user.email,
-                "phone_number": str(user.phone_number),
-                "description": user.description,
-                "profile_image": user.profile_image.url if user.profile_image else None,
-                "course_created": list(courses.values()),
-                "course_followed": list(members.values())
-            })
-
-        return results
-
+        paths = parse_paths(fields)
+        for name, children in paths.items():
+            if name not in PROFILE_FIELDS:
+                raise HttpError(400, f"Unknown field: {name}")
+            if children and name not in ("course_created", "course_followed"):
+                raise HttpError(400, f"Unknown field: {name}.{next(iter(children))}")
+        selected = PROFILE_FIELDS if not paths else [f for f in paths if f in PROFILE_FIELDS]
+        columns = [f for f in selected if f not in ("course_created", "course_followed")]
+
+        # course_created.name etc. narrow the embedded rows to those columns
+        embedded = {}
+        for name, model in (("course_created", Course), ("course_followed", CourseMember)):
+            allowed = [f.attname for f in model._meta.concrete_fields]
+            for column in paths.get(name, {}):
+                if column not in allowed:
+                    raise HttpError(400, f"Unknown field: {name}.{column}")
+            embedded[name] = list(paths.get(name, {}))
+
+        def embedded_rows(queryset, key, name):
+            if not embedded[name]:
+                return ((row[key], row) for row in queryset.values())
+            return ((row[key], { column: row[column] for column in embedded[name] })
+                    for row in queryset.values(key, *embedded[name]))
+
+        users = User.objects.only("id", "date_joined", *columns)
+
+        def profiles(users):
+            user_ids = [user.id for user in users]
+
+            # One grouped query per embedded list instead of two per user
+            created = {}
+            if "course_created" in selected:
+                courses = Course.objects.filter(teacher_id__in=user_ids)
+                for teacher_id, course in embedded_rows(courses, "teacher_id", "course_created"):
+                    created.setdefault(teacher_id, []).append(course)
+
+            followed = {}
+            if "course_followed" in selected:
+                members = CourseMember.objects.filter(user_id__in=user_ids)
+                for user_id, member in embedded_rows(members, "user_id_id", "course_followed"):
+                    followed.setdefault(user_id, []).append(member)
+
+            render = {
+                "id": lambda user: user.id,
+                "first_name": lambda user: user.first_name,
+                "last_name": lambda user: user.last_name,
+                "email": lambda user: user.email,
+                "phone_number": lambda user: str(user.phone_number),
+                "description": lambda user: user.description,
+                "profile_image": lambda user: user.profile_image.url if user.profile_image else None,
+                "profile_image_variants": lambda user: variant_urls(user.profile_image_variants),
+                "course_created": lambda user: created.get(user.id, []),
+                "course_followed": lambda user: followed.get(user.id, []),
+            }
+
+            return [{ key: render[key](user) for key in selected } for user in users]
+
+        # NDJSON export of every profile, one chunk of users at a time
+        if wants_ndjson(request):
+            rows = users.order_by("-date_joined", "-id").iterator(chunk_size=STREAM_CHUNK_SIZE)
+            return stream_rows(request, (profile for chunk in chunked(rows, STREAM_CHUNK_SIZE)
+                                         for profile in profiles(chunk)))
+
+        page = CursorPagination(ordering=("-date_joined", "-id")).paginate_queryset(users, pagination)
+        return stream_page(profiles(page["items"]), page["next_cursor"])
+
+    except HttpError:
+        raise
     except:
         return { "message": "Failed to list profiles" }
 
@@ -464,10 +588,14 @@ def update_profile(
         user.description = description
 
         if image is not None:
-            user.profile_image.save(image.name, image)
+            user.profile_image.save(image.name, image, save=False)
+            user.profile_image_variants = {}
 
         user.save()
 
+        if image is not None:
+            enqueue_variants(user, "profile_image")
+
         return {
             "username": user.username,
             "email": user.email,
@@ -475,7 +603,8 @@ def update_profile(
             "last_name": user.last_name,
             "phone_number": str(user.phone_number),
             "description": user.description,
-            "image_url": user.profile_image.url if user.profile_image else None
+            "image_url": user.profile_image.url if user.profile_image else None,
+            "image_variants": variant_urls(user.profile_image_variants)
         }
     # except:
     #     return { "message": "Failed to edit profile" }
@@ -0,0 +1,195 @@
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+COMPRESSION_ENCODINGS = getattr(settings, "COMPRESSION_ENCODINGS", ["br", "zstd", "gzip"])
+COMPRESSION_LEVELS = getattr(settings, "COMPRESSION_LEVELS", {"br": 4, "zstd": 3, "gzip": 6})
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "image/svg+xml",
+}
+
+
+# Each encoder returns (feed, flush, finish): feed buffers input and may
+# return output, flush returns everything fed so far, finish ends the stream
+def _gzip(level):
+    # wbits 31 writes the gzip header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+
+
+ENCODERS = { "gzip": _gzip }
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+
+# In order of preference, leaving out the ones whose package is missing
+AVAILABLE_ENCODINGS = [encoding for encoding in COMPRESSION_ENCODINGS if encoding in ENCODERS]
+
+
+def negotiate(accept_encoding):
+    """
+    The encoding to use for an Accept-Encoding header: the one with the
+    highest q value, AVAILABLE_ENCODINGS order breaking ties. None when
+    the client accepts none of them.
+    """
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in AVAILABLE_ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    feed, _, finish = ENCODERS[encoding](COMPRESSION_LEVELS.get(encoding, 6))
+    return feed(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    # Flushed after every chunk so the client gets rows as they are encoded
+    feed, flush, finish = ENCODERS[encoding](COMPRESSION_LEVELS.get(encoding, 6))
+    for chunk in chunks:
+        output = feed(chunk) + flush()
+        if output:
+            yield output
+    yield finish()
+
+
+async def acompress_stream(chunks, encoding):
+    feed, flush, finish = ENCODERS[encoding](COMPRESSION_LEVELS.get(encoding, 6))
+    async for chunk in chunks:
+        output = feed(chunk) + flush()
+        if output:
+            yield output
+    yield finish()
+
+
+def encoded_etag(etag, encoding):
+    # A compressed body is another representation, so a strong ETag has to
+    # change with it: '"abc"' -> '"abc-br"'
+    return etag[:-1] + f'-{encoding}"' if etag.endswith('"') else etag
+
+
+def decoded_etag(etag):
+    """
+    Undoes encoded_etag, for comparing If-None-Match to the ETag of the
+    uncompressed response.
+    """
+    for encoding in ENCODERS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def _compressible(response):
+    content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    Compresses text and JSON responses with Brotli, zstd or gzip, whichever
+    the client accepts and is installed (see negotiate). Bodies smaller than
+    COMPRESSION_MIN_SIZE are left alone; streamed responses are compressed
+    chunk by chunk as they go out.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            return self._not_modified(request, response)
+        if (response.status_code < 200 or response.status_code == 204
+                or response.has_header("Content-Encoding") or not _compressible(response)):
+            return response
+        if not response.streaming and len(response.content) < COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response["Content-Length"]
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        if response.has_header("ETag"):
+            response["ETag"] = encoded_etag(response["ETag"], encoding)
+        response["Content-Encoding"] = encoding
+        return response
+
+    def _not_modified(self, request, response):
+        # A 304 repeats the ETag of the representation the client holds,
+        # which is the encoded one when it got a compressed body
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is not None and response.has_header("ETag"):
+            etag = encoded_etag(response["ETag"], encoding)
+            if etag in request.headers.get("If-None-Match", ""):
+                response["ETag"] = etag
+        return response
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import connections, router
+
+from lms_core.models import CourseContent
+
+# Hard cap on the recursion, which also stops a parent cycle made outside
+# the API from looping forever
+CONTENT_TREE_MAX_DEPTH = getattr(settings, "CONTENT_TREE_MAX_DEPTH", 20)
+
+NODE_FIELDS = ["id", "name", "description", "video_url"]
+
+
+def _tree_sql(connection, from_root):
+    quote = connection.ops.quote_name
+    meta = CourseContent._meta
+    table = quote(meta.db_table)
+    course = quote(meta.get_field("course_id").column)
+    parent = quote(meta.get_field("parent_id").column)
+    columns = ", ".join(f"c.{quote(meta.get_field(name).column)}" for name in NODE_FIELDS)
+    start = "c.id = %s" if from_root else f"c.{parent} IS NULL"
+
+    # Every lookup is by (course, parent), which content_course_parent_idx covers
+    return f"""
+        WITH RECURSIVE tree (id, depth) AS (
+            SELECT c.id, 0 FROM {table} c WHERE c.{course} = %s AND {start}
+            UNION ALL
+            SELECT c.id, tree.depth + 1 FROM {table} c JOIN tree ON c.{parent} = tree.id
+            WHERE c.{course} = %s AND tree.depth < %s
+        )
+        SELECT {columns}, c.{parent}, tree.depth,
+               (SELECT COUNT(*) FROM {table} k WHERE k.{course} = %s AND k.{parent} = c.id)
+        FROM tree JOIN {table} c ON c.id = tree.id
+        ORDER BY tree.depth, c.id
+    """
+
+
+def content_rows(course_id, root_id=None, depth=None):
+    """
+    The contents of a course, or the subtree under ``root_id``, down to
+    ``depth`` levels below the top (0 is the top level alone), in one
+    recursive query. Each row carries its parent, its depth and how many
+    children it has, whether or not they were fetched.
+    """
+    depth = CONTENT_TREE_MAX_DEPTH if depth is None else max(0, min(depth, CONTENT_TREE_MAX_DEPTH))
+    connection = connections[router.db_for_read(CourseContent)]
+    params = [course_id] + ([root_id] if root_id is not None else []) + [course_id, depth, course_id]
+
+    with connection.cursor() as cursor:
+        cursor.execute(_tree_sql(connection, root_id is not None), params)
+        names = NODE_FIELDS + ["parent_id", "depth", "child_count"]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def build_tree(rows):
+    """
+    Nests content_rows() output: each node gets a ``children`` list and
+    the top level nodes are returned.
+    """
+    nodes, roots = {}, []
+
+    for row in rows:
+        node = { name: row[name] for name in NODE_FIELDS + ["child_count"] }
+        node["children"] = []
+        nodes[row["id"]] = node
+
+        parent = nodes.get(row["parent_id"]) if row["depth"] else None
+        (roots if parent is None else parent["children"]).append(node)
+
+    return roots
+
+
+def content_tree(course_id, root_id=None, depth=None):
+    return build_tree(content_rows(course_id, root_id, depth))
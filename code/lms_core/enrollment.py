@@ -0,0 +1,154 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+from lms_core.models import User, Course, CourseLimit, CourseMember, CourseStats
+from lms_core.response_cache import invalidate_responses
+from lms_core.stats import ensure_course_stats, invalidate_user_dashboards
+
+
+class EnrollmentError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def _reserve_seat(course_id, student_id, teacher_id):
+    """
+    Touches the course's stats row only if the teacher owns the course, the
+    student exists and member_count is still below its CourseLimit. The
+    UPDATE holds the row lock until the transaction ends, so concurrent
+    enrollments for the same course queue up here and each one sees the
+    count left by the last.
+
+    Every condition is a correlated EXISTS or subquery on the target row.
+    A filter across a relation would make Django compile the UPDATE to
+    ``WHERE pk IN (SELECT ... JOIN ...)``, and the capacity check would
+    then read the subquery's copy of the row. Under READ COMMITTED, a
+    transaction that waited for the lock only re-checks the target row,
+    so it would still see the old member_count.
+    """
+    limit = CourseLimit.objects.filter(course_id=OuterRef("course_id")).values("limit")[:1]
+
+    return CourseStats.objects.filter(
+        Exists(Course.objects.filter(pk=OuterRef("course_id"), teacher_id=teacher_id)),
+        Exists(User.objects.filter(pk=student_id)),
+        ~Exists(limit) | Q(member_count__lt=Subquery(limit)),
+        pk=course_id,
+    ).update(updated_at=timezone.now())
+
+
+def _refusal(course_id, teacher_id, student_id):
+    course = Course.objects.filter(pk=course_id).values("teacher_id").first()
+
+    if course is None:
+        return EnrollmentError("Course not found")
+    if course["teacher_id"] != teacher_id:
+        return EnrollmentError("Only the course creator has the authority to enroll students.")
+    if CourseMember.objects.filter(course_id=course_id, user_id=student_id).exists():
+        return EnrollmentError("Already enrolled in this course")
+    if not User.objects.filter(pk=student_id).exists():
+        return EnrollmentError("Student not found")
+    return EnrollmentError("Course is full")
+
+
+def enroll(course_id, student_id, teacher_id):
+    """
+    Enrolls a student with a guarded UPDATE on the course's seat row
+    followed by the INSERT, both in one transaction. The member_count
+    increment itself comes from the CourseMember post_save handler, and
+    the (course_id, user_id) unique constraint rejects duplicates.
+    """
+    try:
+        with transaction.atomic():
+            reserved = _reserve_seat(course_id, student_id, teacher_id)
+
+            if not reserved and not CourseStats.objects.filter(pk=course_id).exists():
+                # Courses bulk loaded without signals have no seat row yet
+                ensure_course_stats(course_id)
+                reserved = _reserve_seat(course_id, student_id, teacher_id)
+
+            if not reserved:
+                raise _refusal(course_id, teacher_id, student_id)
+
+            return CourseMember.objects.create(course_id_id=course_id, user_id_id=student_id)
+
+    except IntegrityError:
+        raise _refusal(course_id, teacher_id, student_id)
+
+
+def bulk_enroll(entries, teacher_id):
+    """
+    Enrolls many (course_id, user_id) pairs with a fixed number of queries
+    and returns one result per entry, in order. Courses, students, limits,
+    seat rows and existing memberships are loaded up front, capacity is
+    worked out in memory, and the accepted rows are written with a single
+    bulk_create while the seat rows are locked.
+    """
+    course_ids = {course_id for course_id, _ in entries}
+    user_ids = {user_id for _, user_id in entries}
+
+    with transaction.atomic():
+        teachers = dict(Course.objects.filter(pk__in=course_ids).values_list("id", "teacher_id"))
+        owned = [course_id for course_id, owner in teachers.items() if owner == teacher_id]
+
+        for course_id in set(owned) - set(CourseStats.objects.filter(pk__in=owned).values_list("pk", flat=True)):
+            ensure_course_stats(course_id)
+
+        taken = dict(CourseStats.objects.select_for_update().filter(pk__in=owned).values_list("pk", "member_count"))
+        limits = dict(CourseLimit.objects.filter(course_id__in=owned).values_list("course_id", "limit"))
+        students = set(User.objects.filter(pk__in=user_ids).values_list("id", flat=True))
+        enrolled = set(CourseMember.objects.filter(course_id__in=owned, user_id__in=user_ids)
+                       .values_list("course_id", "user_id"))
+
+        results = []
+        accepted = []
+
+        for course_id, user_id in entries:
+            if course_id not in teachers:
+                message = "Course not found"
+            elif course_id not in taken:
+                message = "Only the course creator has the authority to enroll students."
+            elif user_id not in students:
+                message = "Student not found"
+            elif (course_id, user_id) in enrolled:
+                message = "Already enrolled in this course"
+            elif course_id in limits and taken[course_id] >= limits[course_id]:
+                message = "Course is full"
+            else:
+                message = None
+
+            if message:
+                results.append({ "course_id": course_id, "user_id": user_id, "message": message })
+                continue
+
+            enrolled.add((course_id, user_id))
+            taken[course_id] += 1
+            member = CourseMember(course_id_id=course_id, user_id_id=user_id)
+            accepted.append(member)
+            results.append(member)
+
+        CourseMember.objects.bulk_create(accepted, batch_size=1000)
+
+        # bulk_create skips post_save, so apply the counter and cache
+        # updates the handlers would have made
+        added = Counter(member.course_id_id for member in accepted)
+        if added:
+            CourseStats.objects.filter(pk__in=added).update(member_count=Case(
+                *[When(pk=course_id, then=Value(taken[course_id])) for course_id in added]
+            ))
+        changed_users = {member.user_id_id for member in accepted}
+        transaction.on_commit(lambda: invalidate_user_dashboards(changed_users))
+        if accepted:
+            transaction.on_commit(lambda: invalidate_responses("course_stats"))
+
+    return [
+        result if isinstance(result, dict) else {
+            "id": result.id,
+            "course_id": result.course_id_id,
+            "user_id": result.user_id_id,
+            "roles": result.roles
+        }
+        for result in results
+    ]
@@ -0,0 +1,186 @@
+from asyncio import iscoroutinefunction
+from functools import wraps
+from typing import Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import FileField
+from django.http import HttpResponse
+from ninja import Query, Schema
+from ninja.errors import HttpError
+from ninja.utils import contribute_operation_args
+
+from lms_core.images import variant_urls
+from lms_core.models import ImageVariantsField
+from lms_core.pagination import CursorPagination, unpaginated
+from lms_core.query_planner import nested_schema
+from lms_core.renderers import dumps
+from lms_core.streaming import STREAM_CHUNK_SIZE, astream_rows, stream_rows, wants_ndjson
+
+
+class FieldsetInput(Schema):
+    fields: Optional[str] = None
+    expand: Optional[str] = None
+
+
+def parse_paths(value):
+    """
+    ``"id,teacher.username,teacher.email"`` ->
+    ``{"id": {}, "teacher": {"username": {}, "email": {}}}``
+    """
+    tree = {}
+    for path in (value or "").split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split("."):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _convert(model_field, annotation):
+    # .values() skips what the schema would do to a model attribute
+    if isinstance(model_field, FileField):
+        return lambda value: model_field.storage.url(value) if value else None
+    if isinstance(model_field, ImageVariantsField):
+        return variant_urls
+    if annotation is str or annotation == Optional[str]:
+        return lambda value: value if value is None or isinstance(value, str) else str(value)
+    return None
+
+
+class Projection:
+    """
+    A sparse view of ``schema`` over ``model``: the ``.values()`` lookups
+    it needs and how to fold each row back into the nested shape.
+
+    Only the ``fields`` asked for are returned (all of them when omitted).
+    A relation comes back as its id unless it is named in ``expand`` or
+    narrowed with a dotted field (``teacher.username``), in which case it
+    is embedded, with the same rules one level down.
+    """
+
+    def __init__(self, schema, model, fields=None, expand=None, extra=()):
+        self.lookups = list(extra)
+        self.tree = self._build(schema, model, parse_paths(fields) or None, parse_paths(expand), "")
+
+    def _lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return lookup
+
+    def _build(self, schema, model, selected, expanded, prefix):
+        names = list(schema.model_fields) if selected is None else list(selected)
+        names += [name for name in expanded if name not in names]
+        tree = []
+
+        for name in names:
+            path = prefix.replace("__", ".") + name
+            field = schema.model_fields.get(name)
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = None
+            if field is None or model_field is None or not model_field.concrete:
+                raise HttpError(400, f"Unknown field: {path}")
+
+            nested, _ = nested_schema(field.annotation)
+            narrowed = (selected or {}).get(name) or None
+            lookup = self._lookup(prefix + name)
+
+            if nested is not None and model_field.is_relation:
+                if narrowed is not None or name in expanded:
+                    children = self._build(nested, model_field.related_model, narrowed,
+                                           expanded.get(name, {}), lookup + "__")
+                    tree.append((name, lookup, children))
+                else:
+                    tree.append((name, lookup, None))
+            elif narrowed is not None or name in expanded:
+                raise HttpError(400, f"{path} has no fields to select or expand")
+            else:
+                tree.append((name, lookup, _convert(model_field, field.annotation)))
+
+        return tree
+
+    def apply(self, queryset):
+        # The joins and columns come from the lookups alone
+        return queryset.select_related(None).prefetch_related(None).values(*self.lookups)
+
+    def fold(self, row, tree=None):
+        result = {}
+        for name, lookup, node in self.tree if tree is None else tree:
+            value = row[lookup]
+            if isinstance(node, list):
+                value = None if value is None else self.fold(row, node)
+            elif node is not None:
+                value = node(value)
+            result[name] = value
+        return result
+
+
+def sparse_fieldsets(schema, ordering=("-created_at", "-id")):
+    """
+    Adds ``fields`` and ``expand`` query parameters to a paginated list
+    route (see Projection). When either is given the page is built from
+    ``.values()`` over only the columns and joins the fieldset needs and
+    rendered as is; otherwise the route answers as usual. ``ordering`` must
+    match the route's CursorPagination. Goes above ``@paginate`` (and
+    ``@streamable``).
+
+    @router.get("/courses/", response=list[CourseSchemaOut])
+    @sparse_fieldsets(CourseSchemaOut)
+    @paginate(CursorPagination)
+    def get_courses(request):
+        ...
+    """
+    paginator = CursorPagination(ordering=ordering)
+    order_fields = [field.lstrip("-") for field in ordering]
+
+    def project(queryset, fieldset):
+        projection = Projection(schema, queryset.model, fieldset.fields, fieldset.expand, order_fields)
+        return projection, projection.apply(queryset)
+
+    def respond(projection, page):
+        page["items"] = [projection.fold(row) for row in page["items"]]
+        return HttpResponse(dumps(page), content_type="application/json; charset=utf-8")
+
+    def decorator(func):
+        view = unpaginated(func)
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(request, **kwargs):
+                fieldset = kwargs.pop("ninja_fieldset")
+                if not fieldset.fields and not fieldset.expand:
+                    return await func(request, **kwargs)
+
+                pagination = kwargs.pop("ninja_pagination")
+                projection, queryset = project(await view(request, **kwargs), fieldset)
+
+                if wants_ndjson(request):
+                    rows = queryset.aiterator(chunk_size=STREAM_CHUNK_SIZE)
+                    return astream_rows(request, (projection.fold(row) async for row in rows))
+                return respond(projection, await paginator.apaginate_queryset(queryset, pagination))
+
+            wrapper = async_wrapper
+        else:
+            @wraps(func)
+            def wrapper(request, **kwargs):
+                fieldset = kwargs.pop("ninja_fieldset")
+                if not fieldset.fields and not fieldset.expand:
+                    return func(request, **kwargs)
+
+                pagination = kwargs.pop("ninja_pagination")
+                projection, queryset = project(view(request, **kwargs), fieldset)
+
+                if wants_ndjson(request):
+                    rows = queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+                    return stream_rows(request, (projection.fold(row) for row in rows))
+                return respond(projection, paginator.paginate_queryset(queryset, pagination))
+
+        # wraps() shares the list with func; give this layer its own
+        wrapper._ninja_contribute_args = list(getattr(func, "_ninja_contribute_args", []))
+        contribute_operation_args(wrapper, "ninja_fieldset", FieldsetInput, Query(...))
+        return wrapper
+
+    return decorator
@@ -0,0 +1,165 @@
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from lms_core.models import ImageJob
+
+IMAGE_VARIANT_SIZES = getattr(settings, "IMAGE_VARIANT_SIZES", {"small": 128, "medium": 480, "large": 1024})
+IMAGE_WORKER_THREADS = getattr(settings, "IMAGE_WORKER_THREADS", 2)
+IMAGE_JOB_MAX_ATTEMPTS = getattr(settings, "IMAGE_JOB_MAX_ATTEMPTS", 3)
+IMAGE_JOB_TIMEOUT = getattr(settings, "IMAGE_JOB_TIMEOUT", 300)
+
+# name -> (Pillow format, extension, save options)
+FORMATS = {
+    "jpeg": ("JPEG", ".jpg", {"quality": 85, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", ".webp", {"quality": 80, "method": 4}),
+}
+
+_executor = None
+
+
+def variant_urls(variants, storage=default_storage):
+    return {
+        size: { fmt: storage.url(path) for fmt, path in formats.items() }
+        for size, formats in (variants or {}).items()
+    }
+
+
+def make_variants(source, storage=default_storage):
+    """
+    Writes every IMAGE_VARIANT_SIZES x FORMATS copy of ``source`` next to
+    it under ``variants/`` and returns their storage paths. Images are
+    only ever scaled down.
+    """
+    with storage.open(source, "rb") as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or "A" in image.mode else "RGB")
+
+    stem = os.path.splitext(source)[0]
+    directory, name = os.path.split(stem)
+    variants = {}
+
+    for size_name, size in IMAGE_VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        variants[size_name] = {}
+
+        for fmt, (pil_format, extension, options) in FORMATS.items():
+            frame = resized.convert("RGB") if pil_format == "JPEG" else resized
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, **options)
+            path = os.path.join(directory, "variants", f"{name}_{size_name}{extension}")
+            variants[size_name][fmt] = storage.save(path, ContentFile(buffer.getvalue()))
+
+    return variants
+
+
+def _delete_variants(variants, storage=default_storage):
+    for formats in variants.values():
+        for path in formats.values():
+            storage.delete(path)
+
+
+def enqueue_variants(instance, field):
+    """
+    Queues the resize of ``instance.<field>``. Call it once the original is
+    saved (with ``<field>_variants`` reset to ``{}``). The job row is the
+    queue: run_image_jobs picks it up, and with IMAGE_WORKER_THREADS set it
+    also starts in this process as soon as the transaction commits.
+    """
+    image = getattr(instance, field)
+    if not image:
+        return None
+
+    job = ImageJob.objects.create(model=instance._meta.label_lower, object_id=instance.pk,
+                                  field=field, source=image.name)
+
+    if IMAGE_WORKER_THREADS:
+        transaction.on_commit(lambda: _submit(job.pk))
+
+    return job
+
+
+def _submit(job_id):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(IMAGE_WORKER_THREADS, thread_name_prefix="image-jobs")
+    _executor.submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    try:
+        process_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def _runnable():
+    stale = timezone.now() - timedelta(seconds=IMAGE_JOB_TIMEOUT)
+    return ImageJob.objects.filter(
+        Q(status="pending") | Q(status="running", updated_at__lt=stale),
+        attempts__lt=IMAGE_JOB_MAX_ATTEMPTS,
+    )
+
+
+def pending_jobs(limit=100):
+    """
+    Ids of the jobs waiting to run, including ones whose worker died
+    mid-run (running for longer than IMAGE_JOB_TIMEOUT).
+    """
+    return list(_runnable().order_by("created_at").values_list("id", flat=True)[:limit])
+
+
+def claim_job(job_id):
+    # A conditional UPDATE, so only one worker wins a job
+    return _runnable().filter(pk=job_id).update(
+        status="running", attempts=F("attempts") + 1, updated_at=timezone.now()
+    ) == 1
+
+
+def process_job(job_id):
+    """
+    Runs one job if it can be claimed and stores the variant paths on the
+    row it belongs to, unless that row's image changed in the meantime.
+    Returns True when the job finished.
+    """
+    if not claim_job(job_id):
+        return False
+
+    job = ImageJob.objects.get(pk=job_id)
+    variants_field = f"{job.field}_variants"
+
+    try:
+        variants = make_variants(job.source)
+
+        instance = apps.get_model(job.model).objects.filter(pk=job.object_id).first()
+        if instance is not None and getattr(instance, job.field).name == job.source:
+            setattr(instance, variants_field, variants)
+            # save() rather than update() so the cache invalidation signals
+            # run, and with updated_at so /sync/ clients see the change
+            stamps = [field.name for field in instance._meta.concrete_fields if getattr(field, "auto_now", False)]
+            instance.save(update_fields=[variants_field, *stamps])
+        else:
+            _delete_variants(variants)
+    except Exception:
+        status = "failed" if job.attempts >= IMAGE_JOB_MAX_ATTEMPTS else "pending"
+        ImageJob.objects.filter(pk=job_id).update(status=status, error=traceback.format_exc(),
+                                                  updated_at=timezone.now())
+        return False
+
+    ImageJob.objects.filter(pk=job_id).update(status="done", error="", updated_at=timezone.now())
+    return True
@@ -0,0 +1,262 @@
+import logging
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = getattr(settings, "PERF_N_PLUS_ONE_THRESHOLD", 5)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_API_FILE = os.path.join("lms_core", "api.py")
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_collector = ContextVar("perf_collector", default=None)
+
+
+class Histogram:
+    """
+    Cumulative Prometheus-style histogram, one series per label set.
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            for labels, (counts, total, count) in self._series.items():
+                base = _labels(labels)
+                for bound, bucket in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {bucket}')
+                lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{base}}} {total}")
+                lines.append(f"{self.name}_count{{{base}}} {count}")
+
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._series.items():
+                lines.append(f"{self.name}{{{_labels(labels)}}} {value}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _labels(labels):
+    method, route = labels
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+request_duration = Histogram("lms_request_duration_seconds", "Wall time of each request", DURATION_BUCKETS)
+request_queries = Histogram("lms_request_db_queries", "SQL queries run by each request", QUERY_BUCKETS)
+request_db_time = Histogram("lms_request_db_seconds", "Time spent in SQL by each request", DURATION_BUCKETS)
+response_size = Histogram("lms_response_size_bytes", "Size of each non-streaming response body", SIZE_BUCKETS)
+duplicate_queries = Counter("lms_duplicate_queries_total", "Queries repeated with the same SQL and parameters")
+n_plus_one = Counter("lms_n_plus_one_total", "Requests that ran one statement N_PLUS_ONE_THRESHOLD times or more")
+
+METRICS = (request_duration, request_queries, request_db_time, response_size, duplicate_queries, n_plus_one)
+
+
+class QueryCollector:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+        self.duplicates = 0
+        self.call_sites = {}
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def record(self, sql, params, duration):
+        try:
+            key = (sql, repr(params))
+        except Exception:
+            key = (sql, None)
+
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+
+            if key[1] is not None and key in self._seen:
+                self.duplicates += 1
+            self._seen.add(key)
+
+            seen = self.statements.get(sql, 0) + 1
+            self.statements[sql] = seen
+            if seen == N_PLUS_ONE_THRESHOLD:
+                self.call_sites[sql] = _call_site()
+
+    def repeated(self):
+        return [(sql, self.statements[sql], site) for sql, site in self.call_sites.items()]
+
+
+def _call_site():
+    """
+    The innermost frame in lms_core/api.py, or failing that in lms_core
+    (resolvers in schema.py, for example), that led to the current query.
+    """
+    fallback = None
+    frame = sys._getframe(2)
+
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.endswith(_API_FILE):
+            return f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        if fallback is None and filename.startswith(_PACKAGE_DIR) and filename != __file__:
+            fallback = f"{filename}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+
+    return fallback
+
+
+def _record_query(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record(sql, params, time.perf_counter() - start)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_wrapper, dispatch_uid="lms_core.instrumentation")
+
+for _connection in connections.all(initialized_only=True):
+    install_query_wrapper(None, _connection)
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "unmatched"
+
+
+class PerformanceMiddleware:
+    """
+    Times every request and the SQL it runs. The numbers go out in a
+    Server-Timing header and into the histograms served by ``metrics``,
+    labelled by method and URL pattern. A statement run
+    PERF_N_PLUS_ONE_THRESHOLD times in one request is logged with the line
+    in lms_core/api.py that issued it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        collector = QueryCollector()
+        token = _collector.set(collector)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+
+        self._report(request, response, collector, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        collector = QueryCollector()
+        token = _collector.set(collector)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+
+        self._report(request, response, collector, time.perf_counter() - start)
+        return response
+
+    def _report(self, request, response, collector, elapsed):
+        labels = (request.method, _route(request))
+
+        request_duration.observe(labels, elapsed)
+        request_queries.observe(labels, collector.count)
+        request_db_time.observe(labels, collector.duration)
+        if not response.streaming:
+            response_size.observe(labels, len(response.content))
+        if collector.duplicates:
+            duplicate_queries.inc(labels, collector.duplicates)
+
+        repeated = collector.repeated()
+        if repeated:
+            n_plus_one.inc(labels)
+            for sql, times, site in repeated:
+                logger.warning("Possible N+1 on %s %s: ran %d times from %s: %s",
+                               request.method, labels[1], times, site or "an unknown call site", sql)
+
+        response["Server-Timing"] = (
+            f"app;dur={elapsed * 1000:.1f}, "
+            f'db;dur={collector.duration * 1000:.1f};desc="{collector.count} queries, '
+            f'{collector.duplicates} duplicates"'
+        )
+
+
+def metrics(request):
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from lms_core.models import User, Course, CourseMember, CourseContent, Comment
+from lms_core.response_cache import invalidate_responses
+from lms_core.search import rebuild_search_index
+from lms_core.stats import rebuild_course_stats
+from lms_core.streaming import chunked
+
+
+def iter_json_array(jsonfile, read_size=65536):
+    """
+    Yields the items of a top-level JSON array one at a time without
+    loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+
+    while not eof:
+        block = jsonfile.read(read_size)
+        eof = not block
+        buffer = (buffer + block).lstrip()
+
+        if not started:
+            if not buffer:
+                continue
+            if buffer[0] != "[":
+                raise ValueError("Expected a JSON array")
+            buffer = buffer[1:]
+            started = True
+
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if not buffer or buffer[0] == "]":
+                break
+
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The item continues in the next block
+                break
+
+            if end == len(buffer) and not eof:
+                # A number may continue in the next block
+                break
+
+            yield item
+            buffer = buffer[end:]
+
+
+class Command(BaseCommand):
+    help = "Loads the users, courses, members, contents and comments from csv_data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=os.path.join(settings.BASE_DIR, "csv_data"),
+                            help="Directory holding the csv/json files")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Rows per bulk_create and per transaction")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Processes used to hash passwords")
+        parser.add_argument("--seed", type=int, default=None,
+                            help="Seed for the random member assigned to out of range comments")
+
+    def handle(self, *args, **options):
+        self.path = options["path"]
+        self.batch_size = options["batch_size"]
+        self.workers = options["workers"]
+        random.seed(options["seed"])
+
+        start_time = time.time()
+
+        self.stage("users", self.import_users)
+        self.stage("courses", self.import_courses)
+        self.stage("members", self.import_members)
+        self.stage("contents", self.import_contents)
+        self.stage("comments", self.import_comments)
+        self.stage("course stats and search index", self.finish)
+
+        self.stdout.write("--- %s seconds ---" % (time.time() - start_time))
+
+    def stage(self, name, func):
+        # ``func`` returns the summary of what it did
+        stage_start = time.time()
+        summary = func()
+        self.stdout.write(f"{name}: {summary} in {time.time() - stage_start:.3f}s")
+
+    def open(self, filename):
+        return open(os.path.join(self.path, filename), newline="")
+
+    def load(self, model, chunks, build):
+        """
+        Writes each chunk in its own transaction. ``build`` gets the chunk
+        and returns the objects to create from it. Returns the summary line
+        of the stage.
+        """
+        created = skipped = 0
+
+        for chunk in chunks:
+            objs = build(chunk)
+            with transaction.atomic():
+                model.objects.bulk_create(objs, batch_size=self.batch_size)
+            created += len(objs)
+            skipped += len(chunk) - len(objs)
+
+        return f"{created} created, {skipped} skipped"
+
+    def numbered(self, rows):
+        # Rows are matched to existing data by position (pk = row number),
+        # as the original importer did, so re-running it is a no-op.
+        return ((num + 1, row) for num, row in enumerate(rows))
+
+    def existing_pks(self, model, chunk):
+        return set(model.objects.filter(pk__in=[pk for pk, _ in chunk]).values_list("pk", flat=True))
+
+    def import_users(self):
+        with self.open("user-data.csv") as csvfile, ProcessPoolExecutor(self.workers) as pool:
+            seen = set()
+
+            def build(chunk):
+                names = [row["username"] for row in chunk]
+                existing = set(User.objects.filter(username__in=names).values_list("username", flat=True))
+                rows = []
+                for row in chunk:
+                    if row["username"] in existing or row["username"] in seen:
+                        continue
+                    seen.add(row["username"])
+                    rows.append(row)
+
+                passwords = pool.map(make_password, [row["password"] for row in rows],
+                                     chunksize=max(1, len(rows) // (self.workers * 4)))
+                return [User(username=row["username"],
+                             password=password,
+                             email=row["email"],
+                             first_name=row["firstname"],
+                             last_name=row["lastname"])
+                        for row, password in zip(rows, passwords)]
+
+            return self.load(User, chunked(csv.DictReader(csvfile), self.batch_size), build)
+
+    def import_courses(self):
+        users = set(User.objects.values_list("id", flat=True))
+
+        with self.open("course-data.csv") as csvfile:
+            def build(chunk):
+                existing = self.existing_pks(Course, chunk)
+                return [Course(pk=pk, name=row["name"], price=row["price"],
+                               description=row["description"],
+                               teacher_id=int(row["teacher"]))
+                        for pk, row in chunk
+                        if pk not in existing and int(row["teacher"]) in users]
+
+            return self.load(Course, chunked(self.numbered(csv.DictReader(csvfile)), self.batch_size), build)
+
+    def import_members(self):
+        users = set(User.objects.values_list("id", flat=True))
+        courses = set(Course.objects.values_list("id", flat=True))
+        enrolled = set(CourseMember.objects.values_list("course_id", "user_id"))
+
+        with self.open("member-data.csv") as csvfile:
+            def build(chunk):
+                existing = self.existing_pks(CourseMember, chunk)
+                objs = []
+                for pk, row in chunk:
+                    key = (int(row["course_id"]), int(row["user_id"]))
+                    if pk in existing or key in enrolled or key[0] not in courses or key[1] not in users:
+                        continue
+                    enrolled.add(key)
+                    objs.append(CourseMember(pk=pk, course_id_id=key[0], user_id_id=key[1], roles=row["roles"]))
+                return objs
+
+            return self.load(CourseMember, chunked(self.numbered(csv.DictReader(csvfile)), self.batch_size), build)
+
+    def import_contents(self):
+        courses = set(Course.objects.values_list("id", flat=True))
+
+        with self.open("contents.json") as jsonfile:
+            def build(chunk):
+                existing = self.existing_pks(CourseContent, chunk)
+                return [CourseContent(pk=pk, course_id_id=int(row["course_id"]),
+                                      video_url=row["video_url"], name=row["name"],
+                                      description=row["description"])
+                        for pk, row in chunk
+                        if pk not in existing and int(row["course_id"]) in courses]
+
+            return self.load(CourseContent, chunked(self.numbered(iter_json_array(jsonfile)), self.batch_size), build)
+
+    def import_comments(self):
+        users = set(User.objects.values_list("id", flat=True))
+        contents = set(CourseContent.objects.values_list("id", flat=True))
+
+        with self.open("comments.json") as jsonfile:
+            def build(chunk):
+                existing = self.existing_pks(Comment, chunk)
+                objs = []
+                for pk, row in chunk:
+                    user_id = int(row["user_id"])
+                    if user_id > 50:
+                        user_id = random.randint(5, 40)
+                    if pk in existing or int(row["content_id"]) not in contents or user_id not in users:
+                        continue
+                    objs.append(Comment(pk=pk, content_id_id=int(row["content_id"]),
+                                        member_id_id=user_id, comment=row["comment"]))
+                return objs
+
+            return self.load(Comment, chunked(self.numbered(iter_json_array(jsonfile)), self.batch_size), build)
+
+    def finish(self):
+        # Rows were inserted with explicit primary keys, so move the
+        # sequences past them (a no-op on SQLite)
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), [Course, CourseMember, CourseContent, Comment])
+        with connection.cursor() as cursor:
+            for sql in sequence_sql:
+                cursor.execute(sql)
+
+        # bulk_create skips the signal handlers that maintain these
+        rebuilt = rebuild_course_stats()
+        indexed = rebuild_search_index()
+        invalidate_responses("courses", "contents", "course_stats", "course_limit")
+        return f"{rebuilt} course stats rebuilt, {indexed} search entries indexed"
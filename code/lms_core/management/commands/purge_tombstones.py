@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from lms_core.sync import SYNC_TOMBSTONE_DAYS, purge_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes /sync/ tombstones older than SYNC_TOMBSTONE_DAYS; clients further behind resync in full"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=SYNC_TOMBSTONE_DAYS,
+                            help="Keep tombstones this many days")
+
+    def handle(self, *args, **options):
+        purged = purge_tombstones(options["days"])
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} tombstones"))
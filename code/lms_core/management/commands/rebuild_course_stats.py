@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from lms_core.response_cache import invalidate_responses
+from lms_core.stats import rebuild_course_stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the CourseStats counters from the source tables and fixes any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true",
+                            help="Only report how many rows are out of date, do not write")
+
+    def handle(self, *args, **options):
+        drifted = rebuild_course_stats(dry_run=options["check"])
+
+        if options["check"]:
+            self.stdout.write(f"{drifted} course stats rows are missing or out of date")
+        else:
+            invalidate_responses("course_stats")
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {drifted} course stats rows"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from lms_core.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search entries of every course, content and comment"
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} search entries"))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from lms_core.images import pending_jobs, process_job
+
+
+class Command(BaseCommand):
+    help = "Generates the thumbnail and WebP variants for queued image uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep polling for new jobs instead of exiting when the queue is empty")
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Seconds to wait between polls with --loop")
+        parser.add_argument("--limit", type=int, default=100,
+                            help="Jobs fetched per poll")
+
+    def handle(self, *args, **options):
+        while True:
+            done = failed = 0
+            for job_id in pending_jobs(options["limit"]):
+                if process_job(job_id):
+                    done += 1
+                else:
+                    failed += 1
+
+            if done or failed:
+                self.stdout.write(f"{done} image jobs done, {failed} skipped or failed")
+
+            if not options["loop"]:
+                break
+            if not done and not failed:
+                time.sleep(options["interval"])
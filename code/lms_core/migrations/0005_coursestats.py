@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_course_stats(apps, schema_editor):
+    Course = apps.get_model('lms_core', 'Course')
+    CourseStats = apps.get_model('lms_core', 'CourseStats')
+
+    def counts(model_name, group):
+        model = apps.get_model('lms_core', model_name)
+        return dict(model.objects.order_by().values_list(group).annotate(total=Count('pk')))
+
+    members = counts('CourseMember', 'course_id')
+    contents = counts('CourseContent', 'course_id')
+    comments = counts('Comment', 'content_id__course_id')
+    feedbacks = counts('Feedback', 'course_id')
+
+    CourseStats.objects.bulk_create([
+        CourseStats(course_id_id=pk, member_count=members.get(pk, 0), content_count=contents.get(pk, 0),
+                    comment_count=comments.get(pk, 0), feedback_count=feedbacks.get(pk, 0))
+        for pk in Course.objects.values_list('pk', flat=True).iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_core', '0004_alter_user_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course_id', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='lms_core.course', verbose_name='course')),
+                ('member_count', models.PositiveIntegerField(default=0, verbose_name='member count')),
+                ('content_count', models.PositiveIntegerField(default=0, verbose_name='content count')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='comment count')),
+                ('feedback_count', models.PositiveIntegerField(default=0, verbose_name='feedback count')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Course Stats',
+                'verbose_name_plural': 'Course Stats',
+            },
+        ),
+        migrations.RunPython(populate_course_stats, migrations.RunPython.noop),
+    ]
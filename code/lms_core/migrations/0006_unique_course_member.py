@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_members(apps, schema_editor):
+    CourseMember = apps.get_model('lms_core', 'CourseMember')
+    CourseStats = apps.get_model('lms_core', 'CourseStats')
+
+    keep = CourseMember.objects.values('course_id', 'user_id').annotate(first=Min('id')).values('first')
+    deleted, _ = CourseMember.objects.exclude(id__in=keep).delete()
+
+    if deleted:
+        members = dict(CourseMember.objects.order_by().values_list('course_id').annotate(total=Count('id')))
+        stats = list(CourseStats.objects.all())
+        for row in stats:
+            row.member_count = members.get(row.course_id_id, 0)
+        CourseStats.objects.bulk_update(stats, ['member_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_core', '0005_coursestats'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_members, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='coursemember',
+            constraint=models.UniqueConstraint(fields=('course_id', 'user_id'), name='unique_course_member'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:24
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_limits(apps, schema_editor):
+    # course_set_limit used to create a new row whenever the limit changed;
+    # the newest row is the one in effect
+    CourseLimit = apps.get_model('lms_core', 'CourseLimit')
+    keep = CourseLimit.objects.values('course_id').annotate(last=Max('id')).values('last')
+    CourseLimit.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_core', '0006_unique_course_member'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_limits, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content_id', '-created_at'], name='comment_content_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['member_id', '-created_at'], name='comment_member_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created_at', '-id'], name='course_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['teacher', '-created_at'], name='course_teacher_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecontent',
+            index=models.Index(fields=['course_id', 'parent_id'], name='content_course_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecontent',
+            index=models.Index(fields=['-created_at', '-id'], name='content_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courselimit',
+            index=models.Index(fields=['course_id', 'limit'], name='limit_course_covering_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursemember',
+            index=models.Index(fields=['user_id', 'course_id'], name='member_user_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursemember',
+            index=models.Index(fields=['-created_at', '-id'], name='member_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['course_id', '-created_at'], name='feedback_course_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['-created_at', '-id'], name='feedback_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='courselimit',
+            constraint=models.UniqueConstraint(fields=('course_id',), name='unique_course_limit'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:41
+
+import lms_core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_core', '0007_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='image_variants',
+            field=lms_core.models.ImageVariantsField(blank=True, default=dict, editable=False, verbose_name='Varian Gambar'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_variants',
+            field=lms_core.models.ImageVariantsField(blank=True, default=dict, editable=False, verbose_name='Profile Image Variants'),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='model')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('field', models.CharField(max_length=100, verbose_name='image field')),
+                ('source', models.CharField(max_length=255, verbose_name='original image')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('error', models.TextField(blank=True, default='', verbose_name='last error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Image Job',
+                'verbose_name_plural': 'Image Jobs',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='imagejob_status_created_idx')],
+            },
+        ),
+    ]
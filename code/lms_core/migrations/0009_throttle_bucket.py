@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_core', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='key')),
+                ('tat', models.FloatField(db_index=True, verbose_name='theoretical arrival time')),
+            ],
+            options={
+                'verbose_name': 'Throttle Bucket',
+                'verbose_name_plural': 'Throttle Buckets',
+            },
+        ),
+    ]
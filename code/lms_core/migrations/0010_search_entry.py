@@ -0,0 +1,91 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:51
+
+from itertools import islice
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+# Kept in sync with lms_core.search by hand; a migration must not change
+# when that module does
+FTS_TABLE = 'lms_core_searchentry_fts'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(apps.get_model('lms_core', 'SearchEntry')._meta.db_table)
+
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(f'CREATE INDEX searchentry_document_gin ON {table} USING gin (document)')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(title, body, tokenize='unicode61')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS searchentry_document_gin')
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def populate_search_index(apps, schema_editor):
+    SearchEntry = apps.get_model('lms_core', 'SearchEntry')
+    Course = apps.get_model('lms_core', 'Course')
+    CourseContent = apps.get_model('lms_core', 'CourseContent')
+    Comment = apps.get_model('lms_core', 'Comment')
+
+    def entries():
+        for pk, name, description in Course.objects.values_list('id', 'name', 'description').iterator(2000):
+            yield SearchEntry(kind='course', object_id=pk, course_id=pk, title=(name or '')[:200],
+                              body=description or '')
+        for pk, course_id, name, description in (CourseContent.objects
+                                                 .values_list('id', 'course_id', 'name', 'description')
+                                                 .iterator(2000)):
+            yield SearchEntry(kind='content', object_id=pk, course_id=course_id, title=(name or '')[:200],
+                              body=description or '')
+        for pk, course_id, comment in (Comment.objects.values_list('id', 'content_id__course_id', 'comment')
+                                       .iterator(2000)):
+            yield SearchEntry(kind='comment', object_id=pk, course_id=course_id, body=comment or '')
+
+    rows = entries()
+    while batch := list(islice(rows, 2000)):
+        SearchEntry.objects.bulk_create(batch)
+
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        SearchEntry.objects.update(document=SearchVector('title', weight='A', config='simple')
+                                   + SearchVector('body', weight='B', config='simple'))
+    elif connection.vendor == 'sqlite':
+        table = connection.ops.quote_name(SearchEntry._meta.db_table)
+        schema_editor.execute(f'INSERT INTO {FTS_TABLE} (rowid, title, body) SELECT id, title, body FROM {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms_core', '0009_throttle_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('content', 'Content'), ('comment', 'Comment')], max_length=10, verbose_name='kind')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('course_id', models.BigIntegerField(null=True, verbose_name='course id')),
+                ('title', models.CharField(blank=True, default='', max_length=200, verbose_name='title')),
+                ('body', models.TextField(blank=True, default='', verbose_name='body')),
+                ('document', django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='search document')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
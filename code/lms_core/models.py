@@ -1,26 +1,63 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from .manager import UserManager
 from phonenumber_field.modelfields import PhoneNumberField
 
 # Create your models here.
+class ImageVariantsField(models.JSONField):
+    """
+    Storage paths of the resized copies of an image, as
+    {"small": {"jpeg": "...", "webp": "..."}, ...}. Filled in by the
+    image job worker (lms_core.images).
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("default", dict)
+        kwargs.setdefault("blank", True)
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+class AtomicSaveModel(models.Model):
+    """
+    Saves in a transaction that the post_save handlers (lms_core.signals)
+    run in too, so the CourseStats counters commit or roll back with the
+    row. Deletes already send post_delete inside their own transaction.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
 class User(AbstractUser):
     email = models.EmailField("E-mail address", unique=True)
     phone_number = PhoneNumberField(blank=True)
     description = models.TextField("Description", default="")
     profile_image = models.ImageField("Profile Image", upload_to="user", blank=True, null=True)
+    profile_image_variants = ImageVariantsField("Profile Image Variants")
+    updated_at = models.DateTimeField("Updated at", auto_now=True)
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="user_updated_idx"),
+        ]
+
     def __str__(self):
         return self.email
 
-class Course(models.Model):
+class Course(AtomicSaveModel):
     name = models.CharField("Nama Kursus", max_length=255)
     description = models.TextField("Deskripsi")
     price = models.IntegerField("Harga")
     image = models.ImageField("Gambar", upload_to="course", blank=True, null=True)
+    image_variants = ImageVariantsField("Varian Gambar")
     teacher = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name="Pengajar", on_delete=models.RESTRICT)
     created_at = models.DateTimeField("Dibuat pada", auto_now_add=True)
     updated_at = models.DateTimeField("Diperbarui pada", auto_now=True)
@@ -32,13 +69,18 @@ class Course(models.Model):
         verbose_name = "Mata Kuliah"
         verbose_name_plural = "Data Mata Kuliah"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="course_created_idx"),
+            models.Index(fields=["teacher", "-created_at"], name="course_teacher_created_idx"),
+            models.Index(fields=["updated_at", "id"], name="course_updated_idx"),
+        ]
 
     def is_member(self, user):
         return CourseMember.objects.filter(course_id=self, user_id=user).exists()
 
 ROLE_OPTIONS = [('std', "Siswa"), ('ast', "Asisten")]
 
-class CourseMember(models.Model):
+class CourseMember(AtomicSaveModel):
     course_id = models.ForeignKey(Course, verbose_name="matkul", on_delete=models.RESTRICT)
     user_id = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name="siswa", on_delete=models.RESTRICT)
     roles = models.CharField("peran", max_length=3, choices=ROLE_OPTIONS, default='std')
@@ -48,11 +90,19 @@ class CourseMember(models.Model):
     class Meta:
         verbose_name = "Subscriber Matkul"
         verbose_name_plural = "Subscriber Matkul"
+        constraints = [
+            models.UniqueConstraint(fields=["course_id", "user_id"], name="unique_course_member"),
+        ]
+        indexes = [
+            models.Index(fields=["user_id", "course_id"], name="member_user_course_idx"),
+            models.Index(fields=["-created_at", "-id"], name="member_created_idx"),
+            models.Index(fields=["updated_at", "id"], name="member_updated_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.id} {self.course_id} : {self.user_id}"
 
-class CourseContent(models.Model):
+class CourseContent(AtomicSaveModel):
     name = models.CharField("judul konten", max_length=200)
     description = models.TextField("deskripsi", default='-')
     video_url = models.CharField('URL Video', max_length=200, null=True, blank=True)
@@ -66,6 +116,11 @@ class CourseContent(models.Model):
     class Meta:
         verbose_name = "Konten Matkul"
         verbose_name_plural = "Konten Matkul"
+        indexes = [
+            models.Index(fields=["course_id", "parent_id"], name="content_course_parent_idx"),
+            models.Index(fields=["-created_at", "-id"], name="content_created_idx"),
+            models.Index(fields=["updated_at", "id"], name="content_updated_idx"),
+        ]
 
     def __str__(self) -> str:
         return f'{self.course_id} {self.name}'
@@ -80,11 +135,18 @@ class CourseLimit(models.Model):
     class Meta:
         verbose_name = "Course Limit"
         verbose_name_plural = "Course Limits"
+        constraints = [
+            models.UniqueConstraint(fields=["course_id"], name="unique_course_limit"),
+        ]
+        indexes = [
+            # Covers the capacity lookup in enrollment without touching the table
+            models.Index(fields=["course_id", "limit"], name="limit_course_covering_idx"),
+        ]
 
     def __str__(self) -> str:
         return "Course Limit: " + self.course_id.id + " - " + self.teacher_id.id + " - " + self.limit
 
-class Comment(models.Model):
+class Comment(AtomicSaveModel):
     content_id = models.ForeignKey(CourseContent, verbose_name="konten", on_delete=models.CASCADE)
     member_id = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name="pengguna", on_delete=models.CASCADE)
     comment = models.TextField('komentar')
@@ -94,11 +156,17 @@ class Comment(models.Model):
     class Meta:
         verbose_name = "Komentar"
         verbose_name_plural = "Komentar"
+        indexes = [
+            models.Index(fields=["content_id", "-created_at"], name="comment_content_created_idx"),
+            models.Index(fields=["member_id", "-created_at"], name="comment_member_created_idx"),
+            models.Index(fields=["-created_at", "-id"], name="comment_created_idx"),
+            models.Index(fields=["updated_at", "id"], name="comment_updated_idx"),
+        ]
 
     def __str__(self) -> str:
         return "Komen: "+self.member_id.user_id+"-"+self.comment
 
-class Feedback(models.Model):
+class Feedback(AtomicSaveModel):
     course_id = models.ForeignKey(Course, verbose_name="course", on_delete=models.CASCADE)
     user_id = models.ForeignKey(settings.AUTH_USER_MODEL, verbose_name="user", on_delete=models.CASCADE)
     feedback = models.TextField('feedback')
@@ -108,6 +176,101 @@ class Feedback(models.Model):
     class Meta:
         verbose_name = "Feedback"
         verbose_name_plural = "Feedbacks"
+        indexes = [
+            models.Index(fields=["course_id", "-created_at"], name="feedback_course_created_idx"),
+            models.Index(fields=["-created_at", "-id"], name="feedback_created_idx"),
+            models.Index(fields=["updated_at", "id"], name="feedback_updated_idx"),
+        ]
 
     def __str__(self) -> str:
         return "Feedback: " + str(self.user_id.id) + " - " + str(self.course_id.id) + " - " + self.feedback
+
+class CourseStats(models.Model):
+    course_id = models.OneToOneField(Course, verbose_name="course", primary_key=True,
+                                     on_delete=models.CASCADE, related_name="stats")
+    member_count = models.PositiveIntegerField("member count", default=0)
+    content_count = models.PositiveIntegerField("content count", default=0)
+    comment_count = models.PositiveIntegerField("comment count", default=0)
+    feedback_count = models.PositiveIntegerField("feedback count", default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Course Stats"
+        verbose_name_plural = "Course Stats"
+
+    def __str__(self) -> str:
+        return f"Course Stats: {self.course_id_id}"
+
+JOB_STATUS_OPTIONS = [('pending', "Pending"), ('running', "Running"), ('done', "Done"), ('failed', "Failed")]
+
+class ImageJob(models.Model):
+    model = models.CharField("model", max_length=100)
+    object_id = models.BigIntegerField("object id")
+    field = models.CharField("image field", max_length=100)
+    source = models.CharField("original image", max_length=255)
+    status = models.CharField("status", max_length=10, choices=JOB_STATUS_OPTIONS, default='pending')
+    attempts = models.PositiveSmallIntegerField("attempts", default=0)
+    error = models.TextField("last error", blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Image Job"
+        verbose_name_plural = "Image Jobs"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="imagejob_status_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Image Job: {self.model} {self.object_id} {self.field} ({self.status})"
+
+class ThrottleBucket(models.Model):
+    # One row per throttle key, see lms_core.throttling
+    key = models.CharField("key", max_length=255, primary_key=True)
+    tat = models.FloatField("theoretical arrival time", db_index=True)
+
+    class Meta:
+        verbose_name = "Throttle Bucket"
+        verbose_name_plural = "Throttle Buckets"
+
+    def __str__(self) -> str:
+        return f"Throttle Bucket: {self.key}"
+
+SEARCH_KIND_OPTIONS = [('course', "Course"), ('content', "Content"), ('comment', "Comment")]
+
+class SearchEntry(models.Model):
+    # Text of one course, content or comment, kept by lms_core.search. The
+    # GIN index (Postgres) or FTS5 table (SQLite) is made in the migration.
+    kind = models.CharField("kind", max_length=10, choices=SEARCH_KIND_OPTIONS)
+    object_id = models.BigIntegerField("object id")
+    course_id = models.BigIntegerField("course id", null=True)
+    title = models.CharField("title", max_length=200, blank=True, default="")
+    body = models.TextField("body", blank=True, default="")
+    document = SearchVectorField("search document", null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Search Entry"
+        verbose_name_plural = "Search Entries"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="searchentry_kind_object_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Search Entry: {self.kind} {self.object_id}"
+
+class Tombstone(models.Model):
+    # A deleted row of one of the /sync/ collections, see lms_core.sync
+    collection = models.CharField("collection", max_length=20)
+    object_id = models.BigIntegerField("object id")
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Tombstone"
+        verbose_name_plural = "Tombstones"
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Tombstone: {self.collection} {self.object_id}"
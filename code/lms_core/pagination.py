@@ -0,0 +1,144 @@
+import base64
+import json
+from datetime import datetime
+from functools import partial
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from ninja import Field, Schema
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+
+PAGE_SIZE = getattr(settings, "CURSOR_PAGINATION_PAGE_SIZE", 20)
+MAX_PAGE_SIZE = getattr(settings, "CURSOR_PAGINATION_MAX_PAGE_SIZE", 100)
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HttpError(400, "Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HttpError(400, "Invalid cursor")
+
+    try:
+        return [parse_datetime(v) or v if isinstance(v, str) else v for v in values]
+    except ValueError:
+        raise HttpError(400, "Invalid cursor")
+
+
+def cursor_values(model, ordering, values):
+    """
+    Converts decoded cursor values to the types of the ``ordering`` fields
+    of ``model``. A cursor that was tampered with but still decodes would
+    otherwise reach the query and fail there with a 500.
+    """
+    checked = []
+
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        if value is None or isinstance(value, (list, dict)):
+            raise HttpError(400, "Invalid cursor")
+
+        try:
+            checked.append(model._meta.get_field(name).to_python(value))
+        except FieldDoesNotExist:
+            # An annotation, such as the search rank, which is always a number
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise HttpError(400, "Invalid cursor")
+            checked.append(value)
+        except (ValidationError, TypeError, ValueError):
+            raise HttpError(400, "Invalid cursor")
+
+    return checked
+
+
+def unpaginated(func):
+    """
+    The view underneath ``@paginate``, found through the ``__wrapped__``
+    chain of the decorators stacked on top of it.
+    """
+    while any(arg[0] == "ninja_pagination" for arg in getattr(func, "_ninja_contribute_args", [])):
+        func = func.__wrapped__
+    return func
+
+
+class CursorPagination(AsyncPaginationBase):
+    """
+    Keyset pagination over ``ordering`` (``(-created_at, -id)`` by default).
+
+    Each page is fetched with a ``WHERE created_at < x OR (created_at = x
+    AND id < y)`` filter on the last row of the previous page instead of an
+    OFFSET, so the cost of a page does not depend on how deep it is. The
+    last field of ``ordering`` must be unique. Works on ``.values()``
+    querysets as long as they include the ordering fields.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        page_size: int = Field(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+
+    class Output(Schema):
+        items: List[Any]
+        next_cursor: Optional[str] = None
+
+    def __init__(self, ordering=("-created_at", "-id"), **kwargs: Any) -> None:
+        self.ordering = tuple(ordering)
+        super().__init__(**kwargs)
+
+    def paginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        items = list(self._page(queryset, pagination))
+        return self._result(items, pagination)
+
+    async def apaginate_queryset(self, queryset: QuerySet, pagination: Input, **params: Any) -> Any:
+        items = [item async for item in self._page(queryset, pagination)]
+        return self._result(items, pagination)
+
+    def _page(self, queryset, pagination):
+        queryset = queryset.order_by(*self.ordering)
+
+        if pagination.cursor:
+            values = decode_cursor(pagination.cursor, len(self.ordering))
+            values = cursor_values(queryset.model, self.ordering, values)
+            queryset = queryset.filter(self._after(values))
+
+        return queryset[: pagination.page_size + 1]
+
+    def _result(self, items, pagination):
+        next_cursor = None
+
+        if len(items) > pagination.page_size:
+            items = items[: pagination.page_size]
+            last = items[-1]
+            get = last.get if isinstance(last, dict) else partial(getattr, last)
+            next_cursor = encode_cursor(
+                [get(field.lstrip("-")) for field in self.ordering]
+            )
+
+        return {
+            "items": items,
+            "next_cursor": next_cursor,
+        }
+
+    def _after(self, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        return condition
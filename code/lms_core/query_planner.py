@@ -0,0 +1,111 @@
+from asyncio import iscoroutinefunction
+from functools import wraps
+from typing import get_args, get_origin
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from ninja import Schema
+
+
+def nested_schema(annotation):
+    """
+    Returns (schema, many) for a field annotated with a Schema, a list of
+    Schemas or an Optional of either; (None, False) otherwise.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, Schema):
+        return annotation, False
+
+    origin = get_origin(annotation)
+    args = [arg for arg in get_args(annotation) if arg is not type(None)]
+
+    if origin in (list, tuple, set) and args:
+        schema, _ = nested_schema(args[0])
+        return schema, schema is not None
+
+    if len(args) == 1:
+        return nested_schema(args[0])
+
+    return None, False
+
+
+def related_paths(schema, model, prefix=""):
+    """
+    Walks a response schema alongside its model and returns the
+    (select_related, prefetch_related) lookups needed to serialize it
+    without lazy loads.
+    """
+    select, prefetch = [], []
+
+    for name, field in schema.model_fields.items():
+        nested, many = nested_schema(field.annotation)
+        if nested is None:
+            continue
+
+        try:
+            model_field = model._meta.get_field(field.alias or name)
+        except FieldDoesNotExist:
+            continue
+
+        if not model_field.is_relation or model_field.related_model is None:
+            continue
+
+        path = prefix + model_field.name
+        single = (model_field.many_to_one or model_field.one_to_one) and not many
+
+        sub_select, sub_prefetch = related_paths(nested, model_field.related_model, path + "__")
+
+        if single:
+            select.append(path)
+            select.extend(sub_select)
+            prefetch.extend(sub_prefetch)
+        else:
+            prefetch.append(path)
+            prefetch.extend(sub_select)
+            prefetch.extend(sub_prefetch)
+
+    return select, prefetch
+
+
+def plan_queryset(queryset, schema):
+    select, prefetch = related_paths(schema, queryset.model)
+
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+
+    return queryset
+
+
+def plan_queries(schema):
+    """
+    Applies plan_queryset(schema) to the queryset a view returns.
+
+    @router.get("/comments/", response=list[CourseCommentOut])
+    @paginate(CursorPagination)
+    @plan_queries(CourseCommentOut)
+    def get_comments(request):
+        ...
+    """
+
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(request, *args, **kwargs):
+                result = await func(request, *args, **kwargs)
+                if isinstance(result, QuerySet):
+                    result = plan_queryset(result, schema)
+                return result
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            result = func(request, *args, **kwargs)
+            if isinstance(result, QuerySet):
+                result = plan_queryset(result, schema)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,148 @@
+import json
+from asyncio import iscoroutinefunction
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+from types import UnionType
+from typing import Union, get_args, get_origin
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from django.http import HttpResponse
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+JSON_RENDERER_BACKEND = getattr(settings, "JSON_RENDERER_BACKEND", "orjson")
+
+FLAT_TYPES = (int, str, float, bool, datetime, date, Decimal)
+
+_fallback = NinjaJSONEncoder()
+
+
+def _default(obj):
+    # Types the fast encoders do not know (Decimal, lazy strings, files, ...)
+    if isinstance(obj, FieldFile):
+        return obj.url if obj else None
+    return _fallback.default(obj)
+
+
+def _json_dumps(data):
+    return json.dumps(data, default=_default).encode()
+
+
+def _backend(name):
+    if name == "orjson" and orjson is not None:
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        return lambda data: orjson.dumps(data, default=_default, option=option)
+
+    if name == "msgspec" and msgspec is not None:
+        return msgspec.json.Encoder(enc_hook=_default).encode
+
+    return _json_dumps
+
+
+dumps = _backend(JSON_RENDERER_BACKEND)
+
+
+class FastJSONRenderer(BaseRenderer):
+    """
+    Ninja renderer that encodes with JSON_RENDERER_BACKEND ("orjson",
+    "msgspec" or "json"), falling back to the standard library when the
+    package is not installed.
+    """
+
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+def flat_fields(schema):
+    """
+    Field names of a schema that only holds scalars, with no aliases and no
+    resolve_* methods, so a model's column values can be written as they
+    are. None for any other schema.
+    """
+    names = []
+
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) in (Union, UnionType):
+            args = [arg for arg in get_args(annotation) if arg is not type(None)]
+            annotation = args[0] if len(args) == 1 else None
+
+        if annotation not in FLAT_TYPES or field.alias or hasattr(schema, f"resolve_{name}"):
+            return None
+        names.append(name)
+
+    return names
+
+
+def flat_row(item, fields):
+    if isinstance(item, dict):
+        return { name: item[name] for name in fields }
+    return { name: item.serializable_value(name) for name in fields }
+
+
+def column_fields(model, fields):
+    """
+    True when every field is a concrete, non-relation column of ``model``,
+    so the rows can come from ``.values(*fields)``.
+    """
+    concrete = { field.name: field for field in model._meta.concrete_fields }
+    return all(name in concrete and not concrete[name].is_relation for name in fields)
+
+
+def flat_response(schema):
+    """
+    Renders the page or list a view returns straight to JSON, skipping the
+    response schema, when ``schema`` is flat (see flat_fields). Anything
+    else the view returns goes through Ninja as usual. Goes above
+    ``@streamable`` / ``@paginate``.
+
+    @router.get("/feedbacks/", response=list[FeedbackOut])
+    @flat_response(FeedbackOut)
+    @paginate(CursorPagination)
+    def get_feedbacks(request):
+        ...
+    """
+    fields = flat_fields(schema)
+
+    def render(result):
+        if isinstance(result, dict) and isinstance(result.get("items"), list):
+            result = { **result, "items": [flat_row(item, fields) for item in result["items"]] }
+        elif isinstance(result, list):
+            result = [flat_row(item, fields) for item in result]
+        else:
+            return result
+
+        return HttpResponse(dumps(result), content_type="application/json; charset=utf-8")
+
+    def decorator(func):
+        if fields is None:
+            return func
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(request, *args, **kwargs):
+                return render(await func(request, *args, **kwargs))
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(request, *args, **kwargs):
+            return render(func(request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,227 @@
+import hashlib
+from asyncio import iscoroutinefunction
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+from lms_core.compression import decoded_etag
+from lms_core.routers import REPLICA_PIN_SECONDS, reading_from_replica
+
+RESPONSE_CACHE_ALIAS = getattr(settings, "RESPONSE_CACHE_ALIAS", "default")
+RESPONSE_CACHE_TTLS = getattr(settings, "RESPONSE_CACHE_TTLS", {})
+
+
+def _cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(group):
+    return f"lms:response:{group}:version"
+
+
+def _recent_key(group):
+    return f"lms:response:{group}:recent"
+
+
+def group_version(group):
+    return _cache().get(_version_key(group), 0)
+
+
+def invalidate_responses(*groups):
+    """
+    Bumps the version of each group, which orphans every response cached
+    under the old version; they age out through their TTL.
+    """
+    cache = _cache()
+    for group in groups:
+        key = _version_key(group)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    # Marks the window in which replicas may not have the write yet
+    cache.set_many({_recent_key(group): 1 for group in groups}, REPLICA_PIN_SECONDS)
+
+
+def _cacheable(group):
+    # A replica read made soon after a bump may still return the old rows,
+    # which would then be cached under the new version until the next write
+    return not reading_from_replica() or _cache().get(_recent_key(group)) is None
+
+
+async def _acacheable(group):
+    return not reading_from_replica() or await _cache().aget(_recent_key(group)) is None
+
+
+def _etag(content):
+    return quote_etag(hashlib.md5(content).hexdigest())
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+
+    # The compression middleware tags compressed bodies with their encoding
+    etags = [decoded_etag(value) for value in parse_etags(if_none_match)]
+    return "*" in etags or etag in etags
+
+
+def _response_key(request, group, version):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"lms:response:{group}:{version}:{path}"
+
+
+def _entry(response):
+    if response.status_code != 200 or response.streaming:
+        return None
+    return (response.content, response["Content-Type"], _etag(response.content))
+
+
+def _respond(request, entry):
+    content, content_type, etag = entry
+
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+
+    response["ETag"] = etag
+    return response
+
+
+def cached_response(group, ttl=None):
+    """
+    Caches the rendered response of an anonymous GET route. Entries are
+    keyed by path and query string under the group's current version, so
+    invalidate_responses(group) drops them all at once. Responses carry an
+    ETag and a matching If-None-Match gets a 304. Replica reads are not
+    cached for REPLICA_PIN_SECONDS after an invalidation.
+
+    @router.get("/courses/", auth=None)
+    @decorate_view(cached_response("courses"))
+    def get_courses(request):
+        ...
+    """
+    timeout = ttl if ttl is not None else RESPONSE_CACHE_TTLS.get(group, 60)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET":
+                    return await view(request, *args, **kwargs)
+
+                key = _response_key(request, group, await _cache().aget(_version_key(group), 0))
+                entry = await _cache().aget(key)
+
+                if entry is None:
+                    response = await view(request, *args, **kwargs)
+                    entry = _entry(response)
+                    if entry is None or not await _acacheable(group):
+                        return response
+                    await _cache().aset(key, entry, timeout)
+
+                return _respond(request, entry)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            key = _response_key(request, group, group_version(group))
+            entry = _cache().get(key)
+
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                entry = _entry(response)
+                if entry is None or not _cacheable(group):
+                    return response
+                _cache().set(key, entry, timeout)
+
+            return _respond(request, entry)
+
+        return wrapper
+
+    return decorator
+
+
+def table_state(models):
+    """
+    (count, newest updated_at) of every model's table, in one query. Any
+    insert, update or delete through the ORM changes one of them.
+    """
+    connection = connections[router.db_for_read(models[0])]
+    quote = connection.ops.quote_name
+    parts = [
+        f"SELECT {num}, COUNT(*), MAX({quote(model._meta.get_field('updated_at').column)}) "
+        f"FROM {quote(model._meta.db_table)}"
+        for num, model in enumerate(models)
+    ]
+
+    with connection.cursor() as cursor:
+        cursor.execute(" UNION ALL ".join(parts) + " ORDER BY 1")
+        return [(count, str(newest)) for _, count, newest in cursor.fetchall()]
+
+
+def _state_etag(request, state):
+    key = f"{request.get_full_path()}|{request.headers.get('Accept', '')}|{state}"
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def _tagged(response, etag):
+    if response.status_code in (200, 304) and not response.has_header("ETag"):
+        response["ETag"] = etag
+    return response
+
+
+def table_etag(*models):
+    """
+    Strong ETags for a GET route whose body only depends on the query
+    string and the rows of ``models`` (every table it reads, each with an
+    updated_at column). The ETag comes from table_state() rather than from
+    the body, so a matching If-None-Match costs one aggregate query and
+    gets a 304 without running the view.
+
+    @router.get("/comments/", auth=None)
+    @decorate_view(table_etag(Comment, CourseContent, Course, User))
+    def get_comments(request):
+        ...
+    """
+    def decorator(view):
+        # The state is read before the view runs: a write in between gives
+        # the body an older ETag, which only costs the client a refetch
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET":
+                    return await view(request, *args, **kwargs)
+
+                etag = _state_etag(request, await sync_to_async(table_state)(models))
+                if _not_modified(request, etag):
+                    return _tagged(HttpResponseNotModified(), etag)
+                return _tagged(await view(request, *args, **kwargs), etag)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            etag = _state_etag(request, table_state(models))
+            if _not_modified(request, etag):
+                return _tagged(HttpResponseNotModified(), etag)
+            return _tagged(view(request, *args, **kwargs), etag)
+
+        return wrapper
+
+    return decorator
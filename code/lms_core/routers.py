@@ -0,0 +1,192 @@
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_PIN_SECONDS = getattr(settings, "REPLICA_PIN_SECONDS", 10)
+REPLICA_PIN_COOKIE = "lms_primary_until"
+
+# The replica alias chosen for the running request, None for the primary
+_replica_alias = ContextVar("replica_alias", default=None)
+_pinned = ContextVar("pinned_to_primary", default=False)
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to the replica that read_from_replica picked for the
+    running view, if any. Everything else goes to ``default``.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica_alias.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+
+def reading_from_replica():
+    """
+    Whether the running request reads from a replica (see
+    read_from_replica), which may lag behind the primary.
+    """
+    return _replica_alias.get() is not None
+
+
+def _choose_replica(request):
+    # Clients that wrote in the last REPLICA_PIN_SECONDS stay on the
+    # primary (see ReplicaPinningMiddleware)
+    if request.method != "GET" or _pinned.get():
+        return None
+    aliases = replicas()
+    return random.choice(aliases) if aliases else None
+
+
+def _stream_from(alias, content):
+    # A generator shares its caller's context, so the alias is set around
+    # every step rather than once for the whole loop
+    iterator = iter(content)
+    while True:
+        token = _replica_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _replica_alias.reset(token)
+        yield chunk
+
+
+async def _astream_from(alias, content):
+    iterator = aiter(content)
+    while True:
+        token = _replica_alias.set(alias)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _replica_alias.reset(token)
+        yield chunk
+
+
+def _keep_replica(response, alias):
+    # Streamed bodies run their queries after the view has returned
+    if alias is not None and getattr(response, "streaming", False):
+        if response.is_async:
+            response.streaming_content = _astream_from(alias, response.streaming_content)
+        else:
+            response.streaming_content = _stream_from(alias, response.streaming_content)
+    return response
+
+
+def read_from_replica(view):
+    """
+    Lets the router serve this view's reads from a replica. Meant for the
+    anonymous GET routes, applied through decorate_view. One replica is
+    picked per request, so every query of it sees the same snapshot, and
+    it stays in use while a streamed body is being sent.
+    """
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            alias = _choose_replica(request)
+            token = _replica_alias.set(alias)
+            try:
+                return _keep_replica(await view(request, *args, **kwargs), alias)
+            finally:
+                _replica_alias.reset(token)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = _choose_replica(request)
+        token = _replica_alias.set(alias)
+        try:
+            return _keep_replica(view(request, *args, **kwargs), alias)
+        finally:
+            _replica_alias.reset(token)
+
+    return wrapper
+
+
+def _pin_key(request):
+    authorization = request.headers.get("Authorization")
+    if not authorization:
+        return None
+    return "lms:pin:" + hashlib.md5(authorization.encode()).hexdigest()
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes for replica routing. After a successful non-GET
+    request the client is pinned to the primary for REPLICA_PIN_SECONDS,
+    tracked by its Authorization header (for API clients) and by a cookie
+    (for clients that read anonymously).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        pinned, key, writing = self._pin(request)
+        token = _pinned.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        self._remember(response, key, writing)
+        return response
+
+    async def __acall__(self, request):
+        pinned, key, writing = self._pin(request)
+        token = _pinned.set(pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        self._remember(response, key, writing)
+        return response
+
+    def _pin(self, request):
+        key = _pin_key(request)
+        writing = request.method not in ("GET", "HEAD", "OPTIONS")
+
+        try:
+            pinned_until = float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+
+        pinned = writing or pinned_until > time.time() or (key is not None and cache.get(key) is not None)
+        return pinned, key, writing
+
+    def _remember(self, response, key, writing):
+        if writing and response.status_code < 400:
+            if key is not None:
+                cache.set(key, 1, REPLICA_PIN_SECONDS)
+            response.set_cookie(REPLICA_PIN_COOKIE, str(time.time() + REPLICA_PIN_SECONDS),
+                                max_age=REPLICA_PIN_SECONDS, httponly=True, samesite="Lax")
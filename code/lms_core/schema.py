@@ -1,6 +1,10 @@
 from ninja import Schema
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
+from lms_core.images import variant_urls
+
+# {"small": {"jpeg": url, "webp": url}, ...}
+ImageVariants = Dict[str, Dict[str, str]]
 
 class TokenRequest(Schema):
     username: str
@@ -18,6 +22,15 @@ class UserOut(Schema):
     phone_number: str
     description: str
     profile_image: Optional[str] = None
+    profile_image_variants: ImageVariants = {}
+
+    @staticmethod
+    def resolve_phone_number(obj):
+        return str(obj.phone_number)
+
+    @staticmethod
+    def resolve_profile_image_variants(obj):
+        return variant_urls(obj.profile_image_variants)
 
 class UserIn(Schema):
     first_name: str
@@ -34,10 +47,15 @@ class CourseSchemaOut(Schema):
     description: str
     price: int
     image : Optional[str]
+    image_variants: ImageVariants = {}
     teacher: UserOut
     created_at: datetime
     updated_at: datetime
 
+    @staticmethod
+    def resolve_image_variants(obj):
+        return variant_urls(obj.image_variants)
+
 class CourseMemberIn(Schema):
     course_id: int
     user_id: int
@@ -81,10 +99,22 @@ class CourseContentFull(Schema):
     created_at: datetime
     updated_at: datetime
 
+class CourseContentNode(Schema):
+    id: int
+    name: str
+    description: str
+    video_url: Optional[str]
+    child_count: int
+    children: list["CourseContentNode"] = []
+
+# /sync/ rows, where relations come back as ids (see lms_core.sync)
+class CourseContentSyncOut(CourseContentFull):
+    parent_id: Optional[int] = None
+
 class CourseCommentOut(Schema):
     id: int
     content_id: CourseContentMini
-    member_id: CourseMemberOut
+    member_id: UserOut
     comment: str
     created_at: datetime
     updated_at: datetime
@@ -93,11 +123,28 @@ class CourseCommentIn(Schema):
     comment: str
 
 
+class SearchHit(Schema):
+    kind: str
+    object_id: int
+    course_id: Optional[int]
+    title: str
+    body: str
+    rank: float
+
+class SearchPage(Schema):
+    items: list[SearchHit]
+    next_cursor: Optional[str] = None
+
+
 class FeedbackOut(Schema):
     id: int
     feedback: str
     created_at: datetime
     updated_at: datetime
 
+class FeedbackSyncOut(FeedbackOut):
+    course_id: int
+    user_id: int
+
 class FeedbackIn(Schema):
     feedback: str
@@ -0,0 +1,236 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from lms_core.models import SearchEntry, Course, CourseContent, Comment
+from lms_core.pagination import CursorPagination, cursor_values, decode_cursor, encode_cursor
+from lms_core.streaming import chunked
+
+# Text search configuration on Postgres; 'simple' does not stem, which
+# suits the mix of Indonesian and English in the data
+SEARCH_CONFIG = getattr(settings, "SEARCH_CONFIG", "simple")
+
+# Created by migration 0010 on SQLite
+FTS_TABLE = "lms_core_searchentry_fts"
+RESULT_FIELDS = ["id", "kind", "object_id", "course_id", "title", "body", "rank"]
+
+# Title matches count for twice as much as body matches
+FTS_WEIGHTS = (2.0, 1.0)
+
+
+def _vector():
+    return (SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("body", weight="B", config=SEARCH_CONFIG))
+
+
+def sync_documents(ids=None, using="default"):
+    """
+    Brings the tsvector column (Postgres) or the FTS5 rows (SQLite) of the
+    given entries, or of all of them, in line with their title and body.
+    Ids of deleted entries just drop out of the FTS5 table.
+    """
+    connection = connections[using]
+
+    if connection.vendor == "postgresql":
+        entries = SearchEntry.objects.using(using)
+        (entries if ids is None else entries.filter(pk__in=ids)).update(document=_vector())
+
+    elif connection.vendor == "sqlite":
+        table = connection.ops.quote_name(SearchEntry._meta.db_table)
+        with connection.cursor() as cursor:
+            if ids is None:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+                cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, title, body) SELECT id, title, body FROM {table}")
+                return
+
+            for chunk in chunked(ids, 500):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+                cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, title, body) "
+                               f"SELECT id, title, body FROM {table} WHERE id IN ({placeholders})", chunk)
+
+
+def index_object(kind, object_id, course_id, title="", body=""):
+    """
+    Adds or refreshes the entry of one object (see lms_core.signals).
+    """
+    using = router.db_for_write(SearchEntry)
+    with transaction.atomic(using=using):
+        entry, _ = SearchEntry.objects.using(using).update_or_create(
+            kind=kind, object_id=object_id,
+            defaults={ "course_id": course_id, "title": (title or "")[:200], "body": body or "" },
+        )
+        sync_documents([entry.pk], using)
+
+
+def unindex_object(kind, object_id):
+    using = router.db_for_write(SearchEntry)
+    with transaction.atomic(using=using):
+        entries = SearchEntry.objects.using(using).filter(kind=kind, object_id=object_id)
+        ids = list(entries.values_list("pk", flat=True))
+        if ids:
+            entries.delete()
+            sync_documents(ids, using)
+
+
+def _documents():
+    for row in Course.objects.values_list("id", "name", "description").iterator(chunk_size=2000):
+        yield "course", row[0], row[0], row[1], row[2]
+    for row in CourseContent.objects.values_list("id", "course_id", "name", "description").iterator(chunk_size=2000):
+        yield "content", row[0], row[1], row[2], row[3]
+    for row in Comment.objects.values_list("id", "content_id__course_id", "comment").iterator(chunk_size=2000):
+        yield "comment", row[0], row[1], "", row[2]
+
+
+def rebuild_search_index(batch_size=2000):
+    """
+    Rewrites every search entry from the source tables and returns how
+    many there are.
+    """
+    using = router.db_for_write(SearchEntry)
+    total = 0
+
+    with transaction.atomic(using=using):
+        SearchEntry.objects.using(using).all().delete()
+        for chunk in chunked(_documents(), batch_size):
+            SearchEntry.objects.using(using).bulk_create([
+                SearchEntry(kind=kind, object_id=object_id, course_id=course_id, title=(title or "")[:200],
+                            body=body or "")
+                for kind, object_id, course_id, title, body in chunk
+            ])
+            total += len(chunk)
+        sync_documents(None, using)
+
+    return total
+
+
+def fts_query(text):
+    # Every word has to match, as a prefix; quoting keeps FTS5 syntax out
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _filters(kinds, course_id):
+    conditions, params = [], []
+    if kinds:
+        conditions.append("e.kind IN (" + ", ".join(["%s"] * len(kinds)) + ")")
+        params += list(kinds)
+    if course_id is not None:
+        conditions.append("e.course_id = %s")
+        params.append(course_id)
+    return "".join(f" AND {condition}" for condition in conditions), params
+
+
+def _sqlite_page(connection, text, kinds, course_id, pagination):
+    match = fts_query(text)
+    if not match:
+        return { "items": [], "next_cursor": None }
+
+    table = connection.ops.quote_name(SearchEntry._meta.db_table)
+    filters, params = _filters(kinds, course_id)
+    after, after_params = "", []
+    if pagination.cursor:
+        # Checked like CursorPagination's: the values are bound as they are
+        rank, last_id = cursor_values(SearchEntry, ("-rank", "id"), decode_cursor(pagination.cursor, 2))
+        after, after_params = "WHERE rank < %s OR (rank = %s AND id > %s)", [rank, rank, last_id]
+
+    # bm25() is lower for better matches, so it is negated to rank like Postgres
+    sql = f"""
+        SELECT * FROM (
+            SELECT e.id, e.kind, e.object_id, e.course_id, e.title, e.body,
+                   -bm25({FTS_TABLE}, {FTS_WEIGHTS[0]}, {FTS_WEIGHTS[1]}) AS rank
+            FROM {FTS_TABLE} JOIN {table} e ON e.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s{filters}
+        ) {after}
+        ORDER BY rank DESC, id
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *params, *after_params, pagination.page_size + 1])
+        items = [dict(zip(RESULT_FIELDS, row)) for row in cursor.fetchall()]
+
+    next_cursor = None
+    if len(items) > pagination.page_size:
+        items = items[: pagination.page_size]
+        next_cursor = encode_cursor([items[-1]["rank"], items[-1]["id"]])
+    return { "items": items, "next_cursor": next_cursor }
+
+
+def _postgres_page(using, text, kinds, course_id, pagination):
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    entries = SearchEntry.objects.using(using).filter(document=query)
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    if course_id is not None:
+        entries = entries.filter(course_id=course_id)
+
+    # ts_rank is a real; as a double it survives the trip through the cursor
+    entries = entries.annotate(rank=Cast(SearchRank(F("document"), query), FloatField()))
+    paginator = CursorPagination(ordering=("-rank", "id"))
+    return paginator.paginate_queryset(entries.values(*RESULT_FIELDS), pagination)
+
+
+def _fallback_page(using, text, kinds, course_id, pagination):
+    # No full-text index: every word has to appear in the title or body,
+    # and all matches rank the same
+    entries = SearchEntry.objects.using(using).filter(_words_filter(text))
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    if course_id is not None:
+        entries = entries.filter(course_id=course_id)
+
+    entries = entries.annotate(rank=Value(0.0, output_field=FloatField()))
+    paginator = CursorPagination(ordering=("-rank", "id"))
+    return paginator.paginate_queryset(entries.values(*RESULT_FIELDS), pagination)
+
+
+def _words_filter(text):
+    condition = Q()
+    for word in re.findall(r"\w+", text):
+        condition &= Q(title__icontains=word) | Q(body__icontains=word)
+    return condition
+
+
+def search(text, pagination, kinds=None, course_id=None):
+    """
+    One keyset page of the entries matching ``text``, best match first,
+    optionally only of some ``kinds`` or of one course. Uses the GIN
+    indexed tsvector on Postgres and the FTS5 table on SQLite; other
+    databases get an unranked icontains scan.
+    """
+    using = router.db_for_read(SearchEntry)
+    connection = connections[using]
+
+    if connection.vendor == "postgresql":
+        return _postgres_page(using, text, kinds, course_id, pagination)
+    if connection.vendor == "sqlite":
+        return _sqlite_page(connection, text, kinds, course_id, pagination)
+    return _fallback_page(using, text, kinds, course_id, pagination)
+
+
+def matching_ids(kind, text):
+    """
+    The object ids of one kind matching ``text``, as a subquery to filter
+    the source model with: ``Course.objects.filter(pk__in=...)``.
+    """
+    using = router.db_for_read(SearchEntry)
+    connection = connections[using]
+    entries = SearchEntry.objects.using(using).filter(kind=kind)
+
+    if connection.vendor == "postgresql":
+        entries = entries.filter(document=SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch"))
+    elif connection.vendor == "sqlite":
+        match = fts_query(text)
+        if not match:
+            return entries.none().values("object_id")
+        entries = entries.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                                               [match]))
+    else:
+        entries = entries.filter(_words_filter(text))
+
+    return entries.values("object_id")
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from lms_core.models import User, Course, CourseStats, CourseMember, CourseContent, CourseLimit, Comment, Feedback
+from lms_core.response_cache import invalidate_responses
+from lms_core.search import index_object, unindex_object
+from lms_core.sync import SYNC_COLLECTIONS, record_deletion
+from lms_core.stats import bump, invalidate_user_dashboard
+from lms_core.token_cache import token_cache
+
+# Token cache
+# After commit, so that no worker can cache the old rows again in between
+@receiver(post_save, sender=Token)
+def token_saved(sender, instance, **kwargs):
+    # A rotated key must stop resolving straight away
+    transaction.on_commit(lambda: token_cache.invalidate_user(instance.user_id))
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Django clears the primary key, which is the token key, after deleting
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate(key))
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: token_cache.invalidate_user(instance.pk))
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+# Course stats counters
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.get_or_create(course_id=instance)
+
+def _counter_receivers(model, counter, course_of):
+    def saved(sender, instance, created, **kwargs):
+        if created:
+            bump(course_of(instance), counter, 1)
+
+    def deleted(sender, instance, **kwargs):
+        bump(course_of(instance), counter, -1)
+
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=f"{counter}_saved")
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f"{counter}_deleted")
+
+def _comment_course(comment):
+    if Comment._meta.get_field("content_id").is_cached(comment):
+        return comment.content_id.course_id_id
+    return CourseContent.objects.filter(pk=comment.content_id_id).values_list("course_id", flat=True).first()
+
+_counter_receivers(CourseMember, "member_count", lambda member: member.course_id_id)
+_counter_receivers(CourseContent, "content_count", lambda content: content.course_id_id)
+_counter_receivers(Comment, "comment_count", _comment_course)
+_counter_receivers(Feedback, "feedback_count", lambda feedback: feedback.course_id_id)
+
+# Dashboard cache
+def _dashboard_receivers(model, user_of):
+    def changed(sender, instance, **kwargs):
+        # After commit: a request in between would cache the old counts again
+        user_id = user_of(instance)
+        transaction.on_commit(lambda: invalidate_user_dashboard(user_id))
+
+    post_save.connect(changed, sender=model, weak=False, dispatch_uid=f"dashboard_{model.__name__}_saved")
+    post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f"dashboard_{model.__name__}_deleted")
+
+_dashboard_receivers(CourseMember, lambda member: member.user_id_id)
+_dashboard_receivers(Course, lambda course: course.teacher_id)
+_dashboard_receivers(Comment, lambda comment: comment.member_id_id)
+
+# Response cache
+RESPONSE_GROUPS = {
+    User: ["courses", "contents"],
+    Course: ["courses", "contents", "course_stats", "course_limit"],
+    CourseContent: ["contents", "course_stats"],
+    CourseMember: ["course_stats"],
+    Comment: ["course_stats"],
+    Feedback: ["course_stats"],
+    CourseStats: ["course_stats"],
+    CourseLimit: ["course_limit"],
+}
+
+def _response_receivers(model, groups):
+    def changed(sender, **kwargs):
+        # After commit, or a request in between could cache the old rows
+        # under the new version (cached_response covers lagging replicas)
+        transaction.on_commit(lambda: invalidate_responses(*groups))
+
+    post_save.connect(changed, sender=model, weak=False, dispatch_uid=f"responses_{model.__name__}_saved")
+    post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f"responses_{model.__name__}_deleted")
+
+for model, groups in RESPONSE_GROUPS.items():
+    _response_receivers(model, groups)
+
+# Search index
+SEARCH_DOCUMENTS = {
+    Course: ("course", {"name", "description"},
+             lambda course: (course.pk, course.name, course.description)),
+    CourseContent: ("content", {"name", "description", "course_id"},
+                    lambda content: (content.course_id_id, content.name, content.description)),
+    Comment: ("comment", {"comment", "content_id"},
+              lambda comment: (_comment_course(comment), "", comment.comment)),
+}
+
+def _search_receivers(model, kind, fields, document):
+    def saved(sender, instance, update_fields=None, **kwargs):
+        # Saves that leave the text alone (image variants, ...) keep the entry
+        if update_fields is None or fields & set(update_fields):
+            index_object(kind, instance.pk, *document(instance))
+
+    def deleted(sender, instance, **kwargs):
+        unindex_object(kind, instance.pk)
+
+    post_save.connect(saved, sender=model, weak=False, dispatch_uid=f"search_{kind}_saved")
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f"search_{kind}_deleted")
+
+for model, (kind, fields, document) in SEARCH_DOCUMENTS.items():
+    _search_receivers(model, kind, fields, document)
+
+# Sync tombstones
+def _tombstone_receiver(model, collection):
+    def deleted(sender, instance, **kwargs):
+        record_deletion(collection, instance.pk)
+
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f"tombstone_{collection}")
+
+for collection, (model, _) in SYNC_COLLECTIONS.items():
+    _tombstone_receiver(model, collection)
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from lms_core.models import User, Course, CourseStats, CourseMember, CourseContent, Comment, Feedback
+
+COUNTERS = ["member_count", "content_count", "comment_count", "feedback_count"]
+
+DASHBOARD_CACHE_TTL = getattr(settings, "DASHBOARD_CACHE_TTL", 60)
+
+
+def _count(queryset, group):
+    counted = queryset.order_by().values(group).annotate(total=Count("pk")).values("total")
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def annotate_course_counts(courses):
+    """
+    Annotates each course with the live value of every CourseStats counter,
+    one correlated subquery per counter.
+    """
+    return courses.annotate(
+        live_member_count=_count(CourseMember.objects.filter(course_id=OuterRef("pk")), "course_id"),
+        live_content_count=_count(CourseContent.objects.filter(course_id=OuterRef("pk")), "course_id"),
+        live_comment_count=_count(Comment.objects.filter(content_id__course_id=OuterRef("pk")),
+                                  "content_id__course_id"),
+        live_feedback_count=_count(Feedback.objects.filter(course_id=OuterRef("pk")), "course_id"),
+    )
+
+
+def rebuild_course_stats(dry_run=False):
+    """
+    Recomputes CourseStats from the source tables and returns the number of
+    rows that were missing or out of date.
+    """
+    courses = annotate_course_counts(Course.objects.all())
+    existing = {stats.pk: stats for stats in CourseStats.objects.all()}
+    to_create, to_update = [], []
+
+    for course in courses.values("pk", *["live_" + counter for counter in COUNTERS]).iterator(chunk_size=2000):
+        live = {counter: course["live_" + counter] for counter in COUNTERS}
+        stats = existing.get(course["pk"])
+
+        if stats is None:
+            to_create.append(CourseStats(course_id_id=course["pk"], **live))
+        elif any(getattr(stats, counter) != value for counter, value in live.items()):
+            for counter, value in live.items():
+                setattr(stats, counter, value)
+            to_update.append(stats)
+
+    if not dry_run:
+        with transaction.atomic():
+            CourseStats.objects.bulk_create(to_create, batch_size=1000)
+            CourseStats.objects.bulk_update(to_update, COUNTERS, batch_size=1000)
+
+    return len(to_create) + len(to_update)
+
+
+def ensure_course_stats(course_id):
+    """
+    Creates the stats row for a course from the live counts if it is
+    missing. Returns False when the course itself does not exist.
+    """
+    if CourseStats.objects.filter(pk=course_id).exists():
+        return True
+
+    course = annotate_course_counts(Course.objects.filter(pk=course_id)).first()
+    if course is None:
+        return False
+
+    CourseStats.objects.get_or_create(
+        pk=course_id,
+        defaults={counter: getattr(course, "live_" + counter) for counter in COUNTERS},
+    )
+    return True
+
+
+def bump(course_id, counter, delta):
+    """
+    Adjusts one counter with a single UPDATE so that concurrent writers
+    cannot lose increments. Runs in the caller's transaction, which for
+    the signal handlers is the one that saved or deleted the row (see
+    AtomicSaveModel). The counter never goes below zero: a drifted
+    counter must not make the delete that triggered it fail.
+    """
+    with transaction.atomic():
+        updated = CourseStats.objects.filter(pk=course_id).update(**{counter: Greatest(F(counter) + delta, 0)})
+        if not updated and delta > 0:
+            # The stats row predates this counter or was removed; rebuild it
+            # from scratch (which already includes this row) rather than
+            # starting from zero.
+            ensure_course_stats(course_id)
+
+
+def dashboard_cache_key(user_id):
+    return f"lms:dashboard:{user_id}"
+
+
+def _dashboard_query(user_id):
+    return User.objects.filter(pk=user_id).annotate(
+        course_followed_count=_count(CourseMember.objects.filter(user_id=OuterRef("pk")), "user_id"),
+        course_created_count=_count(Course.objects.filter(teacher=OuterRef("pk")), "teacher"),
+        comment_count=_count(Comment.objects.filter(member_id=OuterRef("pk")), "member_id"),
+    ).values("course_followed_count", "course_created_count", "comment_count")
+
+
+def user_dashboard_counts(user_id):
+    """
+    Returns the dashboard counters for a user, reading all three in one
+    query and caching the result for DASHBOARD_CACHE_TTL seconds.
+    """
+    key = dashboard_cache_key(user_id)
+    counts = cache.get(key)
+
+    if counts is None:
+        counts = _dashboard_query(user_id).first()
+        if counts is None:
+            raise User.DoesNotExist
+        cache.set(key, counts, DASHBOARD_CACHE_TTL)
+
+    return counts
+
+
+async def auser_dashboard_counts(user_id):
+    key = dashboard_cache_key(user_id)
+    counts = await cache.aget(key)
+
+    if counts is None:
+        counts = await _dashboard_query(user_id).afirst()
+        if counts is None:
+            raise User.DoesNotExist
+        await cache.aset(key, counts, DASHBOARD_CACHE_TTL)
+
+    return counts
+
+
+def invalidate_user_dashboard(user_id):
+    cache.delete(dashboard_cache_key(user_id))
+
+
+def invalidate_user_dashboards(user_ids):
+    cache.delete_many([dashboard_cache_key(user_id) for user_id in user_ids])
@@ -0,0 +1,149 @@
+from asyncio import iscoroutinefunction
+from functools import wraps
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from lms_core.pagination import unpaginated
+from lms_core.renderers import column_fields, dumps, flat_fields, flat_row
+
+NDJSON = "application/x-ndjson"
+STREAM_CHUNK_SIZE = getattr(settings, "STREAM_CHUNK_SIZE", 2000)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def wants_ndjson(request):
+    return NDJSON in request.headers.get("Accept", "")
+
+
+def stream_page(items, next_cursor=None):
+    """
+    Streams a cursor page as ``{"items": [...], "next_cursor": ...}``,
+    encoding one item at a time instead of building the whole body.
+    """
+    def chunks():
+        yield '{"items": ['
+        for num, item in enumerate(items):
+            yield ("," if num else "") + dumps(item).decode()
+        yield '], "next_cursor": ' + dumps(next_cursor).decode() + '}'
+
+    return StreamingHttpResponse(chunks(), content_type="application/json")
+
+
+def _encoder(schema):
+    if schema is None:
+        return lambda row: dumps(row).decode()
+
+    fields = flat_fields(schema)
+    if fields is not None:
+        return lambda row: dumps(flat_row(row, fields)).decode()
+
+    return lambda row: schema.from_orm(row).model_dump_json()
+
+
+def _frame(request):
+    # (content type, opening, separator, closing)
+    if wants_ndjson(request):
+        return NDJSON, "", "\n", "\n"
+    return "application/json", "[", ",", "]"
+
+
+def stream_rows(request, rows, schema=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Streams ``rows`` as NDJSON when the client sends
+    ``Accept: application/x-ndjson`` and as a JSON array otherwise. Rows
+    are encoded ``chunk_size`` at a time, through ``schema`` when given,
+    so only one chunk is ever held in memory.
+    """
+    content_type, opening, separator, closing = _frame(request)
+    encode = _encoder(schema)
+
+    def chunks():
+        yield opening
+        for num, chunk in enumerate(chunked(rows, chunk_size)):
+            yield (separator if num else "") + separator.join(encode(row) for row in chunk)
+        yield closing
+
+    return StreamingHttpResponse(chunks(), content_type=content_type)
+
+
+def astream_rows(request, rows, schema=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    stream_rows for an async iterable, such as ``queryset.aiterator()``.
+    """
+    content_type, opening, separator, closing = _frame(request)
+    encode = _encoder(schema)
+
+    async def chunks():
+        yield opening
+        chunk, first = [], True
+        async for row in rows:
+            chunk.append(encode(row))
+            if len(chunk) == chunk_size:
+                yield ("" if first else separator) + separator.join(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ("" if first else separator) + separator.join(chunk)
+        yield closing
+
+    return StreamingHttpResponse(chunks(), content_type=content_type)
+
+
+def stream_queryset(request, queryset, schema=None, chunk_size=STREAM_CHUNK_SIZE):
+    return stream_rows(request, queryset.iterator(chunk_size=chunk_size), schema, chunk_size)
+
+
+def streamable(schema, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Lets a paginated list route export its whole result set as NDJSON.
+    With ``Accept: application/x-ndjson`` the pagination is skipped and
+    the queryset is streamed through ``.iterator(chunk_size)``, as
+    ``.values()`` rows when ``schema`` is flat; other requests get the
+    usual pages. Goes right above ``@paginate``.
+
+    @router.get("/comments/", response=list[CourseCommentOut])
+    @streamable(CourseCommentOut)
+    @paginate(CursorPagination)
+    def get_comments(request):
+        ...
+    """
+
+    fields = flat_fields(schema)
+
+    def rows(queryset):
+        if fields is not None and column_fields(queryset.model, fields):
+            return queryset.values(*fields)
+        return queryset
+
+    def decorator(func):
+        view = unpaginated(func)
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(request, **kwargs):
+                if not wants_ndjson(request):
+                    return await func(request, **kwargs)
+
+                kwargs.pop("ninja_pagination", None)
+                queryset = rows(await view(request, **kwargs))
+                return astream_rows(request, queryset.aiterator(chunk_size=chunk_size), schema, chunk_size)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(request, **kwargs):
+            if not wants_ndjson(request):
+                return func(request, **kwargs)
+
+            kwargs.pop("ninja_pagination", None)
+            queryset = rows(view(request, **kwargs))
+            return stream_queryset(request, queryset, schema, chunk_size)
+
+        return wrapper
+
+    return decorator
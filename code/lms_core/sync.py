@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from lms_core.fieldsets import Projection
+from lms_core.models import Comment, Course, CourseContent, Feedback, Tombstone
+from lms_core.pagination import decode_cursor, encode_cursor
+from lms_core.schema import CourseCommentOut, CourseContentSyncOut, CourseSchemaOut, FeedbackSyncOut
+
+SYNC_PAGE_SIZE = getattr(settings, "SYNC_PAGE_SIZE", 500)
+SYNC_SETTLE_SECONDS = getattr(settings, "SYNC_SETTLE_SECONDS", 5)
+SYNC_TOMBSTONE_DAYS = getattr(settings, "SYNC_TOMBSTONE_DAYS", 30)
+
+# name -> (model, row schema)
+SYNC_COLLECTIONS = {
+    "courses": (Course, CourseSchemaOut),
+    "contents": (CourseContent, CourseContentSyncOut),
+    "comments": (Comment, CourseCommentOut),
+    "feedbacks": (Feedback, FeedbackSyncOut),
+}
+
+# A watermark holds the time it was issued and a (timestamp, id) position
+# per collection plus one for the tombstones, flattened into one cursor
+POSITIONS = len(SYNC_COLLECTIONS) + 1
+
+
+def _valid_position(stamp, last_id):
+    if stamp is None:
+        return last_id is None
+    return isinstance(stamp, datetime) and isinstance(last_id, int) and not isinstance(last_id, bool)
+
+
+def decode_watermark(watermark):
+    issued, *values = decode_cursor(watermark, POSITIONS * 2 + 1)
+    positions = [tuple(values[num:num + 2]) for num in range(0, len(values), 2)]
+    # Anything that decodes but is not (timestamp, id) pairs would fail
+    # inside the queries instead
+    if not isinstance(issued, datetime) or not all(_valid_position(*position) for position in positions):
+        raise HttpError(400, "Invalid watermark")
+    return issued, positions
+
+
+def encode_watermark(issued, positions):
+    return encode_cursor([issued] + [value for position in positions for value in position])
+
+
+def _page(queryset, field, position, horizon, limit):
+    """
+    Up to ``limit`` rows past ``position`` in (field, id) order, stopping
+    at ``horizon``. Returns the rows, the new position and whether more
+    rows are waiting.
+    """
+    queryset = queryset.filter(**{f"{field}__lt": horizon})
+    stamp, last_id = position
+    if stamp is not None:
+        queryset = queryset.filter(Q(**{f"{field}__gt": stamp}) | Q(**{field: stamp, "id__gt": last_id}))
+
+    rows = list(queryset.order_by(field, "id")[: limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = (rows[-1][field], rows[-1]["id"])
+    return rows, position, more
+
+
+def sync(watermark=None, limit=SYNC_PAGE_SIZE):
+    """
+    What changed in the synced collections since ``watermark`` (everything
+    when it is None): the rows created or updated, in the same shape as
+    the list endpoints but with relations as ids, and the ids deleted.
+    Each collection returns at most ``limit`` rows; with ``has_more`` the
+    client asks again with the new watermark straight away.
+
+    Rows are read in (updated_at, id) order over indexes on those columns,
+    so the cost follows the number of changes. Only rows older than
+    SYNC_SETTLE_SECONDS are handed out, which gives transactions that
+    were still open, and clocks of other workers, time to catch up before
+    the watermark moves past them.
+    """
+    now = timezone.now()
+    horizon = now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    reset = False
+
+    positions = None
+    if watermark:
+        issued, positions = decode_watermark(watermark)
+        # Tombstones this old are purged, so the client may have missed deletions
+        if issued < now - timedelta(days=SYNC_TOMBSTONE_DAYS):
+            positions, reset = None, True
+
+    if positions is None:
+        # A full download starts after the last deletion: there is nothing to delete yet
+        last = (Tombstone.objects.filter(deleted_at__lt=horizon)
+                .order_by("-deleted_at", "-id").values_list("deleted_at", "id").first())
+        positions = [(None, None)] * len(SYNC_COLLECTIONS) + [last or (None, None)]
+
+    changes, new_positions, has_more = {}, [], False
+    for (name, (model, schema)), position in zip(SYNC_COLLECTIONS.items(), positions):
+        projection = Projection(schema, model, extra=("id", "updated_at"))
+        rows, position, more = _page(projection.apply(model.objects.all()), "updated_at",
+                                     position, horizon, limit)
+        changes[name] = [projection.fold(row) for row in rows]
+        new_positions.append(position)
+        has_more = has_more or more
+
+    tombstones, position, more = _page(Tombstone.objects.values("id", "collection", "object_id", "deleted_at"),
+                                       "deleted_at", positions[-1], horizon, limit)
+    deleted = { name: [] for name in SYNC_COLLECTIONS }
+    for tombstone in tombstones:
+        deleted[tombstone["collection"]].append(tombstone["object_id"])
+    new_positions.append(position)
+
+    return {
+        "changes": changes,
+        "deleted": deleted,
+        "watermark": encode_watermark(horizon, new_positions),
+        "has_more": has_more or more,
+        "reset": reset,
+    }
+
+
+def record_deletion(collection, object_id):
+    Tombstone.objects.create(collection=collection, object_id=object_id)
+
+
+def purge_tombstones(days=SYNC_TOMBSTONE_DAYS):
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
@@ -0,0 +1,433 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import warnings
+from unittest import skipIf, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from lms_core.enrollment import EnrollmentError, _reserve_seat, enroll
+from lms_core.pagination import encode_cursor
+from lms_core.response_cache import cached_response, invalidate_responses
+from lms_core.routers import REPLICA_PIN_COOKIE, _replica_alias
+from lms_core.throttling import THROTTLE_REDIS_URL, build_store
+from lms_core.models import User, Course, CourseContent, CourseLimit, CourseMember, CourseStats, Comment, Feedback
+
+
+def create_rows(start, count):
+    """
+    ``count`` teachers, each with a course, a content, a comment on it and
+    a membership in it, so every list endpoint has rows with relations.
+    """
+    for num in range(start, start + count):
+        user = User.objects.create_user(username=f"user{num}", email=f"user{num}@example.com", password="-")
+        course = Course.objects.create(name=f"course {num}", description="-", price=0, teacher=user)
+        content = CourseContent.objects.create(name=f"content {num}", course_id=course)
+        Comment.objects.create(content_id=content, member_id=user, comment=f"comment {num}")
+        CourseMember.objects.create(course_id=course, user_id=user)
+
+
+class ListQueryCountTests(TestCase):
+    """
+    The list endpoints run a fixed number of queries however many rows a
+    page holds: related rows come from the joins and grouped queries that
+    plan_queries and list_profiles set up, never from a lazy load per row.
+    """
+
+    # path -> queries per page, counting the table_etag state query
+    QUERIES = {
+        "/api/v1/comments/": 2,
+        "/api/v1/members/": 2,
+        "/api/v1/courses/": 1,
+        "/api/v1/profiles/": 4,
+    }
+
+    def get_page(self, path):
+        # Responses of /courses/ are cached; a hit would skip the queries
+        cache.clear()
+        response = self.client.get(path, {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        # /profiles/ streams its page, which runs the grouped queries
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return json.loads(body)["items"]
+
+    def assert_queries(self, rows):
+        for path, queries in self.QUERIES.items():
+            with self.subTest(path=path, rows=rows), self.assertNumQueries(queries):
+                self.assertEqual(len(self.get_page(path)), rows)
+
+    def test_one_row(self):
+        create_rows(0, 1)
+        self.assert_queries(1)
+
+    def test_many_rows(self):
+        create_rows(0, 25)
+        self.assert_queries(25)
+
+
+class SearchCursorTests(TestCase):
+    """
+    A search cursor must hold a numeric rank and an integer id; anything
+    else that still decodes is rejected before it reaches the query.
+    """
+
+    def search(self, cursor):
+        return self.client.get("/api/v1/search/", {"q": "python", "cursor": cursor})
+
+    def test_valid_cursor(self):
+        create_rows(0, 1)
+        self.assertEqual(self.search(encode_cursor([1.5, 1])).status_code, 200)
+
+    def test_invalid_cursor(self):
+        for values in ([{"a": 1}, 2], ["x", "y"], [1.0, "y"], [True, 2], [1.0, None]):
+            with self.subTest(values=values):
+                response = self.search(encode_cursor(values))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"detail": "Invalid cursor"})
+
+
+class ResponseCacheTests(TestCase):
+    """
+    A replica may lag behind the write that bumped a group's version, so
+    cached_response does not store what it read there until
+    REPLICA_PIN_SECONDS have passed.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @cached_response("test")
+        def view(request):
+            self.calls += 1
+            return HttpResponse(b"[]", content_type="application/json")
+
+        self.view = view
+        self.request = RequestFactory().get("/api/v1/test/")
+
+    def get(self, alias=None):
+        token = _replica_alias.set(alias)
+        try:
+            self.assertEqual(self.view(self.request).status_code, 200)
+        finally:
+            _replica_alias.reset(token)
+
+    def test_replica_read_after_write(self):
+        invalidate_responses("test")
+        self.get("replica_0")
+        self.get("replica_0")
+        self.assertEqual(self.calls, 2)
+
+        # The primary has the write, so its rows are cached
+        self.get()
+        self.get("replica_0")
+        self.assertEqual(self.calls, 3)
+
+    def test_replica_read_after_window(self):
+        invalidate_responses("test")
+        cache.delete("lms:response:test:recent")
+        self.get("replica_0")
+        self.get("replica_0")
+        self.assertEqual(self.calls, 1)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Routes through PrimaryReplicaRouter with a second SQLite database as
+    the replica. Each database holds a different user, so the usernames
+    /users/ returns tell which one served the read.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # The test runner only sets up the aliases in settings, so the
+        # replica is added once the class is set up and migrated here
+        super().setUpClass()
+        cls.replica_dir = tempfile.mkdtemp()
+        databases = {
+            **settings.DATABASES,
+            "replica_0": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": os.path.join(cls.replica_dir, "replica.sqlite3"),
+            },
+        }
+
+        # Django warns that the connection handler does not pick up an
+        # overridden DATABASES; the alias is registered with it by hand
+        cls.replica_settings = override_settings(DATABASES=databases)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cls.replica_settings.enable()
+        connections.settings["replica_0"] = connections.configure_settings(databases)["replica_0"]
+        cls.databases = cls.databases | {"replica_0"}
+
+        call_command("migrate", database="replica_0", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica_0"].close()
+        del connections["replica_0"]
+        del connections.settings["replica_0"]
+        cls.replica_settings.disable()
+        shutil.rmtree(cls.replica_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Pins by Authorization header live in the cache
+        cache.clear()
+        self.user = User.objects.create_user(username="primary", email="primary@example.com", password="secret")
+        User(username="replica", email="replica@example.com").save(using="replica_0")
+
+    def usernames(self, client, **headers):
+        response = client.get("/api/v1/users/", **headers)
+        self.assertEqual(response.status_code, 200)
+        return [user["username"] for user in response.json()["items"]]
+
+    def test_anonymous_read(self):
+        self.assertEqual(self.usernames(Client()), ["replica"])
+
+    def test_pinned_by_cookie(self):
+        client = Client()
+        response = client.post("/api/v1/signin/", {"username": "primary", "password": "secret"},
+                               content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(REPLICA_PIN_COOKIE, client.cookies)
+
+        self.assertEqual(self.usernames(client), ["primary"])
+        self.assertEqual(self.usernames(Client()), ["replica"])
+
+    def test_pinned_by_authorization(self):
+        authorization = f"Bearer {Token.objects.create(user=self.user).key}"
+        response = Client().post("/api/v1/profiles/", {
+            "email": "primary@example.com",
+            "first_name": "Primary",
+            "last_name": "User",
+            "phone_number": "+6281234567890",
+            "description": "-",
+        }, HTTP_AUTHORIZATION=authorization)
+        self.assertEqual(response.status_code, 200)
+
+        # A new client has no pin cookie, only the header
+        self.assertEqual(self.usernames(Client(), HTTP_AUTHORIZATION=authorization), ["primary"])
+        self.assertEqual(self.usernames(Client()), ["replica"])
+
+    def test_streamed_body(self):
+        response = Client().get("/api/v1/users/", HTTP_ACCEPT="application/x-ndjson")
+        self.assertTrue(response.streaming)
+
+        # The rows are read while the body is consumed, after the view and
+        # the middleware have returned
+        with CaptureQueriesContext(connections["replica_0"]) as replica_queries, \
+                CaptureQueriesContext(connections["default"]) as primary_queries:
+            lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual([json.loads(line)["username"] for line in lines], ["replica"])
+        self.assertTrue(replica_queries.captured_queries)
+        self.assertFalse(primary_queries.captured_queries)
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot lookups of api.py and lms_core.enrollment are served by the
+    indexes added for them, checked through EXPLAIN. Unique constraints
+    show up as sqlite_autoindex_* on SQLite and under their own name on
+    Postgres.
+    """
+
+    def setUp(self):
+        create_rows(0, 20)
+        course = Course.objects.first()
+        CourseLimit.objects.create(course_id=course, teacher_id=course.teacher, limit=10)
+        Feedback.objects.create(course_id=course, user_id=course.teacher, feedback="-")
+
+    def cases(self):
+        user = User.objects.first()
+        course = Course.objects.first()
+        content = CourseContent.objects.first()
+
+        return [
+            (CourseMember.objects.filter(course_id=course, user_id=user),
+             ("unique_course_member", "sqlite_autoindex_lms_core_coursemember")),
+            (Comment.objects.filter(content_id=content).order_by("-created_at"),
+             ("comment_content_created_idx",)),
+            (Comment.objects.filter(member_id=user).order_by("-created_at"),
+             ("comment_member_created_idx",)),
+            (Feedback.objects.filter(course_id=course).order_by("-created_at"),
+             ("feedback_course_created_idx",)),
+            (CourseLimit.objects.filter(course_id=course).values("limit"),
+             ("limit_course_covering_idx", "unique_course_limit", "sqlite_autoindex_lms_core_courselimit")),
+            (CourseContent.objects.filter(course_id=course, parent_id=None),
+             ("content_course_parent_idx",)),
+            (Course.objects.filter(teacher=user),
+             ("course_teacher_created_idx",)),
+            (Course.objects.order_by("-created_at", "-id")[:21],
+             ("course_created_idx",)),
+        ]
+
+    def assert_plans(self):
+        for queryset, indexes in self.cases():
+            plan = queryset.explain()
+            with self.subTest(query=str(queryset.query)):
+                self.assertTrue(any(index in plan for index in indexes), plan)
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite plans")
+    def test_sqlite_plans(self):
+        self.assert_plans()
+
+    @skipUnless(connection.vendor == "postgresql", "Postgres plans; set POSTGRES_DB to run")
+    def test_postgres_plans(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            # On tables this small a sequential scan is always cheapest
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        self.assert_plans()
+
+
+class EnrollmentLimitTests(TestCase):
+    """
+    The guarded UPDATE of _reserve_seat stops matching the seat row once
+    member_count reaches the CourseLimit, on every backend.
+    """
+
+    LIMIT = 2
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(username="teacher", email="teacher@example.com", password="-")
+        self.course = Course.objects.create(name="course", description="-", price=0, teacher=self.teacher)
+        CourseLimit.objects.create(course_id=self.course, teacher_id=self.teacher, limit=self.LIMIT)
+        self.students = [User.objects.create_user(username=f"student{num}", email=f"student{num}@example.com",
+                                                  password="-")
+                         for num in range(self.LIMIT + 1)]
+
+    def test_full_course(self):
+        for student in self.students[:self.LIMIT]:
+            self.assertEqual(_reserve_seat(self.course.id, student.id, self.teacher.id), 1)
+            enroll(self.course.id, student.id, self.teacher.id)
+
+        last = self.students[-1]
+        self.assertEqual(_reserve_seat(self.course.id, last.id, self.teacher.id), 0)
+        with self.assertRaisesMessage(EnrollmentError, "Course is full"):
+            enroll(self.course.id, last.id, self.teacher.id)
+
+        self.assertEqual(CourseMember.objects.filter(course_id=self.course).count(), self.LIMIT)
+        self.assertEqual(CourseStats.objects.get(pk=self.course.id).member_count, self.LIMIT)
+
+
+# docker compose run --rm django-test runs this against Postgres
+@skipIf(connection.vendor == "sqlite", "SQLite serializes every writer; set POSTGRES_DB to run")
+class EnrollmentConcurrencyTests(TransactionTestCase):
+    """
+    Many threads enroll different students in one course at the same
+    moment, each on its own connection; the CourseLimit must hold exactly.
+    """
+
+    THREADS = 20
+    LIMIT = 5
+
+    def test_limit_holds(self):
+        teacher = User.objects.create_user(username="teacher", email="teacher@example.com", password="-")
+        course = Course.objects.create(name="course", description="-", price=0, teacher=teacher)
+        CourseLimit.objects.create(course_id=course, teacher_id=teacher, limit=self.LIMIT)
+        students = [User.objects.create_user(username=f"student{num}", email=f"student{num}@example.com",
+                                             password="-").id
+                    for num in range(self.THREADS)]
+
+        start = threading.Barrier(self.THREADS)
+        results = []
+
+        def enroll_one(student_id):
+            try:
+                start.wait()
+                enroll(course.id, student_id, teacher.id)
+                results.append("enrolled")
+            except EnrollmentError as error:
+                results.append(error.message)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=enroll_one, args=(student_id,)) for student_id in students]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count("enrolled"), self.LIMIT)
+        self.assertEqual(results.count("Course is full"), self.THREADS - self.LIMIT)
+        self.assertEqual(CourseMember.objects.filter(course_id=course).count(), self.LIMIT)
+        self.assertEqual(CourseStats.objects.get(pk=course.id).member_count, self.LIMIT)
+
+
+def hit_throttle(name, key, hits, limit, period, start, results):
+    """
+    Runs in a child process: waits for its siblings, then hits ``key``
+    ``hits`` times and reports how many were allowed.
+    """
+    try:
+        store = build_store(name)
+        start.wait()
+        results.put(sum(store.hit(key, limit, period)[0] for _ in range(hits)))
+    except BaseException as error:
+        start.abort()
+        results.put(repr(error))
+    finally:
+        connections.close_all()
+
+
+@skipUnless("fork" in multiprocessing.get_all_start_methods(), "Needs the fork start method")
+class SharedThrottleTests(TransactionTestCase):
+    """
+    Several processes hit one key at once, as gunicorn workers would. A
+    shared store must let at most ``LIMIT`` hits through in total, where
+    the per-process 'local' store lets ``LIMIT`` through in every process.
+    """
+
+    PROCESSES = 6
+    HITS = 30
+    LIMIT = 10
+    PERIOD = 3600
+
+    def run_processes(self, name):
+        # Children open their own connections to the test database
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        key = f"test_throttle_{uuid.uuid4().hex}"
+        start = context.Barrier(self.PROCESSES)
+        results = context.Queue()
+
+        processes = [
+            context.Process(target=hit_throttle,
+                            args=(name, key, self.HITS, self.LIMIT, self.PERIOD, start, results))
+            for _ in range(self.PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        allowed = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+
+        errors = [result for result in allowed if isinstance(result, str)]
+        self.assertFalse(errors, errors)
+        return allowed
+
+    def test_database_store(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("An in-memory SQLite database is not shared between processes")
+        self.assertEqual(sum(self.run_processes("database")), self.LIMIT)
+
+    @skipUnless(THROTTLE_REDIS_URL, "THROTTLE_REDIS_URL is not set")
+    def test_redis_store(self):
+        self.assertEqual(sum(self.run_processes("redis")), self.LIMIT)
+
+    def test_local_store(self):
+        self.assertEqual(self.run_processes("local"), [self.LIMIT] * self.PROCESSES)
@@ -0,0 +1,233 @@
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+from ninja.throttling import AnonRateThrottle as NinjaAnonRateThrottle
+from ninja.throttling import UserRateThrottle as NinjaUserRateThrottle
+
+from lms_core.models import ThrottleBucket
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STORE = getattr(settings, "THROTTLE_STORE", "database")
+THROTTLE_REDIS_URL = getattr(settings, "THROTTLE_REDIS_URL", None)
+THROTTLE_RETRY_SECONDS = getattr(settings, "THROTTLE_RETRY_SECONDS", 30)
+THROTTLE_PRUNE_PROBABILITY = getattr(settings, "THROTTLE_PRUNE_PROBABILITY", 0.001)
+THROTTLE_LOCAL_MAX_KEYS = getattr(settings, "THROTTLE_LOCAL_MAX_KEYS", 10000)
+
+# Float slack so that exactly `limit` hits in one instant still fit
+EPSILON = 1e-6
+
+
+def gcra(tat, now, limit, period):
+    """
+    One hit of the generic cell rate algorithm, a token bucket that holds
+    ``limit`` tokens and refills one every ``period / limit`` seconds. The
+    whole state of a key is its theoretical arrival time ``tat`` (None for
+    a new key). Returns ``(allowed, new tat, seconds to wait)``.
+    """
+    tat = max(tat or now, now) + period / limit
+    if tat - now > period + EPSILON:
+        return False, None, tat - now - period
+    return True, tat, 0.0
+
+
+class LocalThrottleStore:
+    """
+    Per-process store: the limits hold for each worker on its own.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period):
+        with self._lock:
+            now = time.time()
+            allowed, tat, wait = gcra(self._tats.get(key), now, limit, period)
+            if allowed:
+                self._tats[key] = tat
+                if len(self._tats) > self.max_keys:
+                    # A key whose tat has passed is a full bucket, same as no key
+                    self._tats = { key: tat for key, tat in self._tats.items() if tat > now }
+            return allowed, wait
+
+
+class DatabaseThrottleStore:
+    """
+    Keeps one ThrottleBucket row per key and applies each hit with a single
+    INSERT ... ON CONFLICT DO UPDATE ... WHERE, so concurrent workers
+    cannot both take the last token. Postgres and SQLite only.
+    """
+
+    def __init__(self, prune_probability=0.001):
+        self.prune_probability = prune_probability
+        self.table = ThrottleBucket._meta.db_table
+
+    def _upsert_sql(self, connection):
+        if connection.vendor == "postgresql":
+            greatest = "GREATEST"
+        elif connection.vendor == "sqlite":
+            greatest = "MAX"
+        else:
+            raise ImproperlyConfigured(f"The database throttle store does not support {connection.vendor}")
+
+        table = connection.ops.quote_name(self.table)
+        key = connection.ops.quote_name("key")
+        return (
+            f"INSERT INTO {table} ({key}, tat) VALUES (%s, %s) "
+            f"ON CONFLICT ({key}) DO UPDATE SET tat = {greatest}({table}.tat, %s) + %s "
+            f"WHERE {greatest}({table}.tat, %s) + %s <= %s "
+            f"RETURNING tat"
+        )
+
+    def hit(self, key, limit, period):
+        connection = connections[router.db_for_write(ThrottleBucket)]
+        now = time.time()
+        interval = period / limit
+
+        with connection.cursor() as cursor:
+            cursor.execute(self._upsert_sql(connection),
+                           [key, now + interval, now, interval, now, interval, now + period + EPSILON])
+            allowed = cursor.fetchone() is not None
+
+            if random.random() < self.prune_probability:
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(self.table)} WHERE tat < %s", [now])
+
+        if allowed:
+            return True, 0.0
+
+        # Denied, so the row exists and was left as it was
+        tat = ThrottleBucket.objects.using(connection.alias).filter(key=key).values_list("tat", flat=True).first()
+        allowed, _, wait = gcra(tat, now, limit, period)
+        return allowed, wait
+
+
+# KEYS[1] = key, ARGV = limit, period. Uses the server's clock, so workers
+# with skewed clocks still agree.
+GCRA_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+tat = tat + period / limit
+if tat - now > period + 0.000001 then
+    return {0, tostring(tat - now - period)}
+end
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+return {1, '0'}
+"""
+
+
+class RedisThrottleStore:
+    """
+    Runs each hit as one Lua script, which Redis executes atomically. Keys
+    expire as soon as their bucket is full again.
+    """
+
+    def __init__(self, url):
+        if redis is None:
+            raise ImproperlyConfigured("The redis throttle store needs the redis package")
+        if not url:
+            raise ImproperlyConfigured("THROTTLE_REDIS_URL is not set")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.script = self.client.register_script(GCRA_SCRIPT)
+
+    def hit(self, key, limit, period):
+        allowed, wait = self.script(keys=[key], args=[limit, period])
+        return bool(allowed), float(wait)
+
+
+class FallbackThrottleStore:
+    """
+    Uses ``store`` while it answers. When it fails, counts in ``fallback``
+    (per process) and tries ``store`` again after ``retry_after`` seconds,
+    so an outage neither blocks requests nor slows each one down.
+    """
+
+    def __init__(self, store, fallback, retry_after=30):
+        self.store = store
+        self.fallback = fallback
+        self.retry_after = retry_after
+        self._down_until = 0.0
+
+    def hit(self, key, limit, period):
+        if time.monotonic() >= self._down_until:
+            try:
+                return self.store.hit(key, limit, period)
+            except Exception:
+                logger.warning("Throttle store %s failed, counting per process for %ss",
+                               type(self.store).__name__, self.retry_after, exc_info=True)
+                self._down_until = time.monotonic() + self.retry_after
+
+        return self.fallback.hit(key, limit, period)
+
+
+def build_store(name):
+    if name == "redis":
+        return RedisThrottleStore(THROTTLE_REDIS_URL)
+    if name == "database":
+        return DatabaseThrottleStore(THROTTLE_PRUNE_PROBABILITY)
+    if name == "local":
+        return LocalThrottleStore(THROTTLE_LOCAL_MAX_KEYS)
+    raise ImproperlyConfigured(f"Unknown THROTTLE_STORE: {name}")
+
+
+_store = None
+
+
+def throttle_store():
+    global _store
+    if _store is None:
+        local = LocalThrottleStore(THROTTLE_LOCAL_MAX_KEYS)
+        try:
+            store = build_store(THROTTLE_STORE)
+        except ImproperlyConfigured:
+            logger.warning("Throttle store %r unavailable, counting per process", THROTTLE_STORE, exc_info=True)
+            store = local
+        if not isinstance(store, LocalThrottleStore):
+            store = FallbackThrottleStore(store, local, THROTTLE_RETRY_SECONDS)
+        _store = store
+    return _store
+
+
+class SharedRateThrottle:
+    """
+    Swaps the cached request history of Ninja's rate throttles for a hit
+    on throttle_store(), which every worker process shares. The rate is
+    part of the key, so routes with different rates have their own budget.
+    """
+
+    def allow_request(self, request):
+        self.key = self.get_cache_key(request)
+        if self.key is None:
+            return True
+
+        key = f"{self.key}:{self.num_requests}/{self.duration}"
+        allowed, self.retry_after = throttle_store().hit(key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return getattr(self, "retry_after", None) or None
+
+
+class AnonRateThrottle(SharedRateThrottle, NinjaAnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(SharedRateThrottle, NinjaUserRateThrottle):
+    pass
@@ -0,0 +1,162 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Maps an auth token key to its User: a small in-process LRU in front of
+    the shared Django cache ``alias``.
+
+    Invalidation (see lms_core.signals) removes the local entries of this
+    process and the shared entries every worker reads from, so other
+    workers stop resolving a deleted token or a changed user within
+    ``ttl`` seconds, when their own local entry expires. When ``alias`` is
+    a per-process cache (LocMemCache, the default without REDIS_URL) only
+    the local LRU is used, and ``ttl`` alone bounds how long other workers
+    may lag behind.
+    """
+
+    def __init__(self, max_size=10000, ttl=5, alias="default", shared_ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.alias = alias
+        self.shared_ttl = shared_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        cache = caches[self.alias]
+        if isinstance(cache, (LocMemCache, DummyCache)):
+            return None
+        return cache
+
+    def get(self, key):
+        user = self._get_local(key)
+        if user is None and self.shared is not None:
+            user = self.shared.get(self._shared_key(key))
+            if user is not None:
+                self._set_local(key, user)
+        return self._counted(user)
+
+    async def aget(self, key):
+        user = self._get_local(key)
+        if user is None and self.shared is not None:
+            user = await self.shared.aget(self._shared_key(key))
+            if user is not None:
+                self._set_local(key, user)
+        return self._counted(user)
+
+    def set(self, key, user):
+        self._set_local(key, user)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), user, self.shared_ttl)
+
+    async def aset(self, key, user):
+        self._set_local(key, user)
+        if self.shared is not None:
+            await self.shared.aset(self._shared_key(key), user, self.shared_ttl)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+        if self.shared is not None:
+            # Shared entries are keyed by token alone, so look the keys up
+            keys = Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+            self.shared.delete_many([self._shared_key(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "shared": self.shared is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _shared_key(self, key):
+        # Hashed so raw tokens never show up in the cache backend
+        return "lms:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+    def _counted(self, user):
+        with self._lock:
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        # Handlers mutate request.user (see update_profile), so every request
+        # gets its own instance.
+        return copy.copy(user) if user is not None else None
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            user, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return user
+
+    def _set_local(self, key, user):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (copy.copy(user), time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        user_id = entry[0].pk
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, "TOKEN_CACHE_MAX_SIZE", 10000),
+    ttl=getattr(settings, "TOKEN_CACHE_TTL", 5),
+    alias=getattr(settings, "TOKEN_CACHE_ALIAS", "default"),
+    shared_ttl=getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+)
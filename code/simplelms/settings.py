@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'lms_core.instrumentation.PerformanceMiddleware',
+    'lms_core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'lms_core.routers.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'simplelms.urls'
@@ -77,12 +81,90 @@ WSGI_APPLICATION = 'simplelms.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Set POSTGRES_DB to use Postgres; otherwise the local SQLite file is used.
+# DB_CONN_MAX_AGE keeps connections open between requests (seconds, 0 closes
+# them after each request). DB_POOL=1 switches to psycopg 3's connection pool
+# instead, which Django does not allow together with persistent connections.
+
+if os.environ.get('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+
+    if os.environ.get('DB_POOL') == '1':
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # A file rather than memory, so that the multi-process tests
+            # in lms_core.tests share it
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+
+# Read replicas: every alias named replica* serves the anonymous list and
+# stats endpoints (see lms_core.routers). POSTGRES_REPLICA_HOSTS is a comma
+# separated list of host[:port]; local_settings may add SQLite replicas the
+# same way. Tests mirror the replicas onto default.
+
+for num, host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(','))):
+    replica_host, _, replica_port = host.partition(':')
+    DATABASES[f'replica_{num}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default'].get('PORT', '5432'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['lms_core.routers.PrimaryReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Set REDIS_URL to share the cache between worker processes.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
+
+
+# Where the API throttles keep their counters: 'redis' (THROTTLE_REDIS_URL)
+# or 'database' are shared by every worker, 'local' counts per process.
+# While the store is down the throttles count per process and try it again
+# after THROTTLE_RETRY_SECONDS.
+THROTTLE_STORE = 'redis' if os.environ.get('REDIS_URL') else 'database'
+THROTTLE_REDIS_URL = os.environ.get('REDIS_URL')
+THROTTLE_RETRY_SECONDS = 30
 
 
 # Password validation
@@ -136,6 +218,72 @@ AUTH_USER_MODEL = 'lms_core.User'
 
 PHONENUMBER_DEFAULT_REGION = 'ID'
 
+# Token -> user resolution cache used by GlobalAuth: an in-process LRU
+# whose entries live TOKEN_CACHE_TTL seconds, in front of the shared cache
+# (only when REDIS_URL is set) whose entries live TOKEN_CACHE_SHARED_TTL
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL = 5
+TOKEN_CACHE_ALIAS = 'default'
+TOKEN_CACHE_SHARED_TTL = 300
+
+# Keyset pagination for the list endpoints
+CURSOR_PAGINATION_PAGE_SIZE = 20
+CURSOR_PAGINATION_MAX_PAGE_SIZE = 100
+
+# Seconds a user's dashboard counters are served from cache
+DASHBOARD_CACHE_TTL = 60
+
+# Seconds each group of anonymous read endpoints is served from cache
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TTLS = {
+    'courses': 60,
+    'contents': 60,
+    'course_stats': 30,
+    'course_limit': 300,
+}
+
+# Deepest level /courses/{id}/content-tree/ will recurse to
+CONTENT_TREE_MAX_DEPTH = 20
+
+# Postgres text search configuration used by /search/
+SEARCH_CONFIG = 'simple'
+
+# /sync/: rows per collection per call, seconds a change settles before
+# it is handed out, and days tombstones are kept (see purge_tombstones)
+SYNC_PAGE_SIZE = 500
+SYNC_SETTLE_SECONDS = 5
+SYNC_TOMBSTONE_DAYS = 30
+
+# Response compression: encodings in order of preference (br and zstd need
+# the brotli and zstandard packages), their levels, and the smallest body
+# worth compressing in bytes
+COMPRESSION_ENCODINGS = ['br', 'zstd', 'gzip']
+COMPRESSION_LEVELS = {
+    'br': 4,
+    'zstd': 3,
+    'gzip': 6,
+}
+COMPRESSION_MIN_SIZE = 1024
+
+# Rows encoded per chunk by the streaming exports
+STREAM_CHUNK_SIZE = 2000
+
+# JSON encoder used for API responses: 'orjson', 'msgspec' or 'json'
+JSON_RENDERER_BACKEND = 'orjson'
+
+# Thumbnails made from uploaded images (longest side in pixels). Jobs also
+# run on this many threads inside the web process; set it to 0 to leave
+# them all to `manage.py run_image_jobs`.
+IMAGE_VARIANT_SIZES = {
+    'small': 128,
+    'medium': 480,
+    'large': 1024,
+}
+IMAGE_WORKER_THREADS = 2
+
+# Log a possible N+1 when one statement runs this many times in a request
+PERF_N_PLUS_ONE_THRESHOLD = 5
+
 try:
     from .local_settings import *
 except:
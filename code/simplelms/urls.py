@@ -19,17 +19,20 @@ from django.urls import path
 from lms_core.views import index, testing, addData, editData, deleteData
 from ninja_simple_jwt.auth.views.api import mobile_auth_router
 from lms_core.api import router
+from lms_core.instrumentation import metrics
+from lms_core.renderers import FastJSONRenderer
 from ninja import NinjaAPI
 from ninja.security import HttpBearer
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 
-api = NinjaAPI()
+api = NinjaAPI(renderer=FastJSONRenderer())
 api.add_router("", router)
 
 urlpatterns = [
     path('api/v1/', api.urls),
     path('admin/', admin.site.urls),
+    path('metrics', metrics),
     path('testing/', testing),
     path('tambah/', addData),
     path('ubah/', editData),
@@ -0,0 +1,78 @@
+"""
+Compares /courses/batch_enroll/ paths: one enroll() call per entry versus
+bulk_enroll(). Runs against a throwaway SQLite database.
+
+    python load_test/bench_batch_enroll.py [10 1000 10000]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "simplelms.settings")
+
+import django
+from django.conf import settings
+
+settings.DATABASES["default"]["NAME"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from lms_core.enrollment import EnrollmentError, bulk_enroll, enroll
+from lms_core.models import Course, CourseLimit, CourseMember, User
+
+
+def count_queries(func):
+    queries = []
+
+    def counter(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+
+    return elapsed, len(queries)
+
+
+def per_entry(entries, teacher_id):
+    for course_id, user_id in entries:
+        try:
+            enroll(course_id, user_id, teacher_id)
+        except EnrollmentError:
+            pass
+
+
+def main(sizes):
+    call_command("migrate", verbosity=0)
+
+    largest = max(sizes)
+    teacher = User.objects.create(username="teacher", email="teacher@example.com")
+    User.objects.bulk_create(
+        [User(username=f"student{num}", email=f"student{num}@example.com") for num in range(largest)],
+        batch_size=1000,
+    )
+    students = list(User.objects.exclude(pk=teacher.pk).values_list("id", flat=True))
+    courses = [Course.objects.create(name=f"course {num}", description="-", price=0, teacher=teacher)
+               for num in range(10)]
+    for course in courses:
+        CourseLimit.objects.create(course_id=course, teacher_id=teacher, limit=largest // 12 + 1)
+
+    print(f"{'entries':>8} {'path':>10} {'seconds':>10} {'queries':>8}")
+    for size in sizes:
+        entries = [(courses[num % len(courses)].id, students[num]) for num in range(size)]
+
+        for name, run in (("per-entry", per_entry), ("bulk", bulk_enroll)):
+            CourseMember.objects.all().delete()
+            call_command("rebuild_course_stats", verbosity=0, stdout=open(os.devnull, "w"))
+
+            elapsed, queries = count_queries(lambda: run(entries, teacher.id))
+            print(f"{size:>8} {name:>10} {elapsed:>10.3f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 1000, 10000])
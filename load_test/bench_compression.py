@@ -0,0 +1,87 @@
+"""
+Bytes on the wire and CPU time per request of the large JSON list
+endpoints for every response encoding CompressionMiddleware can pick,
+plus the cost of a conditional GET answered with 304 by table_etag.
+Runs against a throwaway SQLite database filled by import_lms_data.
+
+    python load_test/bench_compression.py [requests per case]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "simplelms.settings")
+
+import django
+from django.conf import settings
+
+URLS = (
+    "/api/v1/profiles/?page_size=100",
+    "/api/v1/members/?page_size=100",
+    "/api/v1/comments/?page_size=100",
+)
+
+
+def setup(path):
+    settings.DATABASES["default"]["NAME"] = path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ["testserver"]
+    django.setup()
+
+
+def seed():
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    call_command("import_lms_data", seed=42, stdout=open(os.devnull, "w"))
+
+
+def body(response):
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def measure(client, url, repeat, **headers):
+    # process_time counts the CPU of this process only: the view, the
+    # renderer and the compressor, not time spent waiting. Streamed bodies
+    # are read inside the loop since they are only encoded then.
+    response, content = None, b""
+    start = time.process_time()
+    for _ in range(repeat):
+        response = client.get(url, **headers)
+        content = body(response)
+    cpu = (time.process_time() - start) / repeat
+    return response, len(content), cpu
+
+
+def main(repeat):
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    setup(path)
+    seed()
+
+    from django.test import Client
+    from lms_core.compression import AVAILABLE_ENCODINGS
+
+    client = Client()
+    print(f"{repeat} requests per case; encodings available: {', '.join(AVAILABLE_ENCODINGS)}")
+    print(f"{'url':<36} {'encoding':>10} {'status':>7} {'bytes':>9} {'ratio':>7} {'CPU us':>9}")
+
+    for url in URLS:
+        plain, size, cpu = measure(client, url, repeat)
+        print(f"{url:<36} {'identity':>10} {plain.status_code:>7} {size:>9} {1:>7.2f} {cpu * 1e6:>9.0f}")
+
+        for encoding in AVAILABLE_ENCODINGS:
+            response, length, cpu = measure(client, url, repeat, HTTP_ACCEPT_ENCODING=encoding)
+            print(f"{'':<36} {response.get('Content-Encoding', 'identity'):>10} {response.status_code:>7} "
+                  f"{length:>9} {length / size:>7.2f} {cpu * 1e6:>9.0f}")
+
+        response, length, cpu = measure(client, url, repeat, HTTP_IF_NONE_MATCH=plain["ETag"])
+        print(f"{'':<36} {'304':>10} {response.status_code:>7} {length:>9} "
+              f"{length / size:>7.2f} {cpu * 1e6:>9.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,97 @@
+"""
+Measures per-request database connection overhead on /api/v1/courses/ and
+/api/v1/whoami/ with connections closed after every request
+(DB_CONN_MAX_AGE=0), persistent connections (DB_CONN_MAX_AGE=60) and the
+psycopg 3 pool (DB_POOL=1). Each mode runs in its own process against the
+database configured through the POSTGRES_* variables; the response and
+token caches are cleared before every request so each one reaches the
+database.
+
+    POSTGRES_DB=simple_lms POSTGRES_USER=simple_user \\
+    POSTGRES_PASSWORD=simple_password POSTGRES_PORT=5551 \\
+        python load_test/bench_connections.py [requests]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code")
+
+MODES = {
+    "close": {"DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL": "1"},
+}
+
+
+def worker(requests):
+    sys.path.append(CODE_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "simplelms.settings")
+
+    import django
+    django.setup()
+
+    from django.core.cache import cache
+    from django.db import close_old_connections
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+    from lms_core.models import User
+    from lms_core.token_cache import token_cache
+    from rest_framework.authtoken.models import Token
+
+    user, _ = User.objects.get_or_create(username="bench_connections", defaults={"email": "bench@example.com"})
+    token, _ = Token.objects.get_or_create(user=user)
+
+    opened = []
+    connection_created.connect(lambda **kwargs: opened.append(1), weak=False)
+
+    client = Client(HTTP_HOST="localhost")
+    headers = {"HTTP_AUTHORIZATION": f"Bearer {token.key}"}
+    results = {}
+
+    for path in ("/api/v1/courses/", "/api/v1/whoami/"):
+        timings = []
+        opened.clear()
+
+        for _ in range(requests):
+            cache.clear()
+            token_cache.clear()
+            start = time.perf_counter()
+            client.get(path, **headers)
+            # The test client skips the request_finished handler that
+            # applies CONN_MAX_AGE, so run it as a real request would
+            close_old_connections()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        results[path] = {
+            "mean_ms": statistics.mean(timings),
+            "p50_ms": timings[len(timings) // 2],
+            "p95_ms": timings[int(len(timings) * 0.95) - 1],
+            "connections": len(opened),
+        }
+
+    print(json.dumps(results))
+
+
+def main(requests):
+    print(f"{'mode':>10} {'path':>18} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'conns':>6}")
+
+    for mode, env in MODES.items():
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", str(requests)],
+            env={**os.environ, **env}, capture_output=True, text=True, check=True,
+        ).stdout
+        for path, row in json.loads(output.strip().splitlines()[-1]).items():
+            print(f"{mode:>10} {path:>18} {row['mean_ms']:>9.2f} {row['p50_ms']:>9.2f} "
+                  f"{row['p95_ms']:>9.2f} {row['connections']:>6}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        worker(int(sys.argv[2]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
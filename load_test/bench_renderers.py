@@ -0,0 +1,82 @@
+"""
+Serialization cost per row for every response schema in lms_core/schema.py:
+
+- ninja:  from_orm + model_dump + the stock NinjaJSONEncoder
+- fast:   from_orm + model_dump + FastJSONRenderer's encoder
+- flat:   flat_row + FastJSONRenderer's encoder, skipping the schema
+          (only for flat schemas)
+
+Rows are unsaved model instances built in memory, with their relations
+filled in, so no database is needed.
+
+    python load_test/bench_renderers.py [10000]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "simplelms.settings")
+
+import django
+
+django.setup()
+
+from django.utils import timezone
+from ninja.responses import NinjaJSONEncoder
+from lms_core import schema
+from lms_core.models import Comment, Course, CourseContent, CourseMember, Feedback, User
+from lms_core.renderers import JSON_RENDERER_BACKEND, dumps, flat_fields, flat_row
+
+
+def build(rows):
+    now = timezone.now()
+    teacher = User(id=1, username="teacher", email="teacher@example.com", first_name="Tea",
+                   last_name="Cher", phone_number="+6281234567890", description="Teaches things")
+    course = Course(id=1, name="Belajar Django", description="Belajar Django dengan Mudah",
+                    price=1000000, teacher=teacher, created_at=now, updated_at=now)
+    content = CourseContent(id=1, name="Pengenalan", description="Bab pertama", video_url="https://example.com/v",
+                            course_id=course, created_at=now, updated_at=now)
+
+    return {
+        schema.TokenResponse: [{"token": f"{num:040x}"} for num in range(rows)],
+        schema.UserOut: [teacher] * rows,
+        schema.FeedbackOut: [Feedback(id=num, feedback="Kursusnya bagus", created_at=now, updated_at=now)
+                             for num in range(rows)],
+        schema.CourseSchemaOut: [course] * rows,
+        schema.CourseMemberOut: [CourseMember(id=num, course_id=course, user_id=teacher, roles="std")
+                                 for num in range(rows)],
+        schema.CourseContentMini: [content] * rows,
+        schema.CourseContentFull: [content] * rows,
+        schema.CourseCommentOut: [Comment(id=num, content_id=content, member_id=teacher, comment="Mantap",
+                                          created_at=now, updated_at=now)
+                                  for num in range(rows)],
+    }
+
+
+def per_row(func, rows):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) / rows * 1e6
+
+
+def main(rows):
+    print(f"{rows} rows, backend {JSON_RENDERER_BACKEND}, microseconds per row")
+    print(f"{'schema':>18} {'ninja':>8} {'fast':>8} {'flat':>8}")
+
+    for out, items in build(rows).items():
+        ninja = per_row(lambda: json.dumps([out.from_orm(item).model_dump() for item in items],
+                                           cls=NinjaJSONEncoder), rows)
+        fast = per_row(lambda: dumps([out.from_orm(item).model_dump() for item in items]), rows)
+
+        fields = flat_fields(out)
+        flat = "-"
+        if fields is not None:
+            flat = f"{per_row(lambda: dumps([flat_row(item, fields) for item in items]), rows):.2f}"
+
+        print(f"{out.__name__:>18} {ninja:>8.2f} {fast:>8.2f} {flat:>8}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
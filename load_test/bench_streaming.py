@@ -0,0 +1,100 @@
+"""
+Peak memory of /feedback/{course_id}/ at a large row count: the old
+list(values()) + JsonResponse body versus the streamed JSON array and
+NDJSON exports. Each mode runs in its own process against the same
+throwaway SQLite database so the peak RSS numbers do not bleed together.
+
+    python load_test/bench_streaming.py [1000000]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "simplelms.settings")
+
+import django
+from django.conf import settings
+
+MODES = ("materialized", "json", "ndjson")
+
+
+def setup(path):
+    settings.DATABASES["default"]["NAME"] = path
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ["testserver"]
+    django.setup()
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def seed(rows):
+    from django.core.management import call_command
+    from django.db import connection, transaction
+    from lms_core.models import Course, User
+
+    call_command("migrate", verbosity=0)
+    teacher = User.objects.create(username="teacher", email="teacher@example.com")
+    course = Course.objects.create(name="course", description="-", price=0, teacher=teacher)
+
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, rows, 10000):
+            cursor.executemany(
+                "INSERT INTO lms_core_feedback (course_id_id, user_id_id, feedback, created_at, updated_at)"
+                " VALUES (%s, %s, %s, %s, %s)",
+                [(course.id, teacher.id, f"feedback number {num}", now, now)
+                 for num in range(start, min(start + 10000, rows))],
+            )
+
+    return course.id
+
+
+def run(mode, course_id):
+    from django.http import JsonResponse
+    from django.test import Client
+    from lms_core.models import Feedback
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    size = 0
+
+    if mode == "materialized":
+        response = JsonResponse(list(Feedback.objects.filter(course_id=course_id).values()), safe=False)
+        size = len(response.content)
+    else:
+        accept = "application/x-ndjson" if mode == "ndjson" else "application/json"
+        response = Client().get(f"/api/v1/feedback/{course_id}/", HTTP_ACCEPT=accept)
+        for chunk in response.streaming_content:
+            size += len(chunk)
+
+    elapsed = time.perf_counter() - start
+    print(f"{mode:>13} {elapsed:>9.2f} {size / 1024 / 1024:>9.1f} {peak_rss_mb() - baseline:>13.1f}")
+
+
+def main(rows):
+    path = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    setup(path)
+
+    start = time.perf_counter()
+    course_id = seed(rows)
+    print(f"seeded {rows} feedback rows in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'mode':>13} {'seconds':>9} {'body MB':>9} {'peak RSS +MB':>13}")
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, "--run", mode, path, str(course_id)], check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        mode, path, course_id = sys.argv[2:5]
+        setup(path)
+        run(mode, int(course_id))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,123 @@
+"""
+Compares throughput and latency of the read routes served over WSGI
+(gunicorn) and ASGI (uvicorn) with the same number of worker processes.
+Uses whatever database the settings point at; run migrate and
+import_lms_data first so the lists are not empty.
+
+    python load_test/bench_wsgi_asgi.py --workers 2 --concurrency 32 --duration 10
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+
+CODE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+
+SERVERS = {
+    "wsgi": ["gunicorn", "simplelms.wsgi:application", "--workers", "{workers}", "--bind", "127.0.0.1:{port}"],
+    "asgi": ["uvicorn", "simplelms.asgi:application", "--workers", "{workers}", "--port", "{port}",
+             "--no-access-log"],
+}
+
+
+def bench_token():
+    sys.path.append(CODE_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "simplelms.settings")
+
+    import django
+    django.setup()
+
+    from lms_core.models import Course, User
+    from rest_framework.authtoken.models import Token
+
+    user, _ = User.objects.get_or_create(username="bench_asgi", defaults={"email": "bench_asgi@example.com"})
+    course = Course.objects.order_by("id").first()
+    return Token.objects.get_or_create(user=user)[0].key, course.id if course else 1
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/v1/courses/")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def load(port, paths, headers, concurrency, duration):
+    latencies = []
+    errors = []
+    deadline = time.time() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        num = offset
+        while time.time() < deadline:
+            path = paths[num % len(paths)]
+            num += 1
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors.append(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(repr(e))
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(num,)) for num in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    token, course_id = bench_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = ["/api/v1/courses/", "/api/v1/contents/", f"/api/v1/course/{course_id}/stats/",
+             "/api/v1/user/dashboard/", "/api/v1/whoami/"]
+
+    print(f"{'server':>6} {'requests':>9} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, command in SERVERS.items():
+        command = [part.format(workers=args.workers, port=args.port) for part in command]
+        server = subprocess.Popen(command, cwd=CODE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(args.port)
+            row = load(args.port, paths, headers, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"{name:>6} {row['requests']:>9} {row['rps']:>9.1f} {row['p50_ms']:>8.2f} "
+              f"{row['p99_ms']:>8.2f} {row['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,205 @@
-from locust import HttpUser, TaskSet, task, between
+"""
+Load test for the /api/v1/ routes with three personas:
+
+- AnonymousBrowser pages through the public lists and reads course stats
+  and feedback.
+- Student signs in, checks whoami and the dashboard, comments and leaves
+  feedback.
+- Teacher signs in and batch-enrolls students into their own courses.
+
+Seed the database first with load_test/seed.py: the personas sign in with
+the csv_data/user-data.csv passwords, and rely on user N being row N of that
+file and course N row N of course-data.csv.
+
+Headless run with SLO checks and a results file:
+
+    locust -f load_test/locust_file.py --headless -u 50 -r 10 -t 2m \\
+        --host http://localhost:8001 --results-file load_test/results.json \\
+        --slo-p50 100 --slo-p95 500 --slo-p99 1000 --slo-rps 50
+
+The run exits with status 1 if any threshold or --slo-fail-ratio is missed.
+"""
+import csv
 import json
+import os
+import random
+import time
 
-class UserBehavior(TaskSet):
-    def on_start(self):
-        self.login()
+from locust import HttpUser, between, events, task
+
+API = "/api/v1"
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code", "csv_data"))
+
+
+def load_fixtures():
+    with open(os.path.join(DATA_DIR, "user-data.csv"), newline="") as csvfile:
+        users = {num + 1: row for num, row in enumerate(csv.DictReader(csvfile))}
+
+    with open(os.path.join(DATA_DIR, "course-data.csv"), newline="") as csvfile:
+        courses = {num + 1: int(row["teacher"]) for num, row in enumerate(csv.DictReader(csvfile))}
+
+    teachers = {}
+    for course_id, teacher in courses.items():
+        teachers.setdefault(teacher, []).append(course_id)
+
+    students = [user_id for user_id in users if user_id not in teachers]
+    return users, list(courses), teachers, students
+
+
+USERS, COURSES, TEACHERS, STUDENTS = load_fixtures()
+CONTENT_COUNT = 500
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument("--results-file", default="load_test/results.json",
+                        help="Where to write the machine-readable results")
+    parser.add_argument("--slo-p50", type=float, default=0, help="Max overall p50 in ms (0 = unchecked)")
+    parser.add_argument("--slo-p95", type=float, default=0, help="Max overall p95 in ms (0 = unchecked)")
+    parser.add_argument("--slo-p99", type=float, default=0, help="Max overall p99 in ms (0 = unchecked)")
+    parser.add_argument("--slo-rps", type=float, default=0, help="Min overall requests per second (0 = unchecked)")
+    parser.add_argument("--slo-fail-ratio", type=float, default=0.01, help="Max share of failed requests")
+
+
+def summarize(entry):
+    return {
+        "requests": entry.num_requests,
+        "failures": entry.num_failures,
+        "rps": entry.total_rps,
+        "avg_ms": entry.avg_response_time,
+        "p50_ms": entry.get_response_time_percentile(0.50),
+        "p95_ms": entry.get_response_time_percentile(0.95),
+        "p99_ms": entry.get_response_time_percentile(0.99),
+        "avg_bytes": entry.avg_content_length,
+    }
+
+
+@events.quitting.add_listener
+def check_slos(environment, **kwargs):
+    options = environment.parsed_options
+    total = summarize(environment.stats.total)
+
+    checks = {
+        "p50_ms": (total["p50_ms"], options.slo_p50, "max"),
+        "p95_ms": (total["p95_ms"], options.slo_p95, "max"),
+        "p99_ms": (total["p99_ms"], options.slo_p99, "max"),
+        "rps": (total["rps"], options.slo_rps, "min"),
+        "fail_ratio": (environment.stats.total.fail_ratio, options.slo_fail_ratio, "max"),
+    }
+    violations = {
+        name: {"value": value, "threshold": threshold}
+        for name, (value, threshold, kind) in checks.items()
+        if threshold and (value > threshold if kind == "max" else value < threshold)
+    }
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "host": environment.host,
+        "users": environment.runner.user_count if environment.runner else None,
+        "total": total,
+        "endpoints": {
+            f"{entry.method} {entry.name}": summarize(entry)
+            for entry in environment.stats.entries.values()
+        },
+        "slo": {name: threshold for name, (_, threshold, _) in checks.items() if threshold},
+        "violations": violations,
+    }
+
+    if options.results_file:
+        with open(options.results_file, "w") as resultfile:
+            json.dump(results, resultfile, indent=2)
+
+    if violations:
+        for name, violation in violations.items():
+            print(f"SLO missed: {name} = {violation['value']:.2f} (threshold {violation['threshold']})")
+        environment.process_exit_code = 1
 
-    def login(self):
-        response = self.client.post("/auth/sign-in", json={
-            "username": "LarissaWylie", 
-            "password": "RLS71GOH8GF" 
+
+class AnonymousBrowser(HttpUser):
+    weight = 6
+    wait_time = between(1, 2)
+
+    @task(4)
+    def browse_courses(self):
+        response = self.client.get(f"{API}/courses/?page_size=20", name=f"{API}/courses/")
+        cursor = response.json().get("next_cursor") if response.ok else None
+        if cursor and random.random() < 0.5:
+            self.client.get(f"{API}/courses/?page_size=20&cursor={cursor}", name=f"{API}/courses/?cursor")
+
+    @task(2)
+    def browse_contents(self):
+        self.client.get(f"{API}/contents/?page_size=20", name=f"{API}/contents/")
+
+    @task(2)
+    def course_stats(self):
+        self.client.get(f"{API}/course/{random.choice(COURSES)}/stats/", name=f"{API}/course/[id]/stats/")
+
+    @task(1)
+    def course_feedback(self):
+        self.client.get(f"{API}/feedback/{random.choice(COURSES)}/", name=f"{API}/feedback/[id]/")
+
+    @task(1)
+    def profiles(self):
+        self.client.get(f"{API}/profiles/?page_size=20&fields=id,first_name,last_name",
+                        name=f"{API}/profiles/")
+
+
+class SignedInUser(HttpUser):
+    abstract = True
+
+    def sign_in(self, user_id):
+        row = USERS[user_id]
+        response = self.client.post(f"{API}/signin/", json={
+            "username": row["username"],
+            "password": row["password"],
         })
-        if response.status_code == 200:
-            self.token = response.json().get("access") 
-        else:
-            print("Login failed:", response.text)
+        token = response.json().get("token") if response.ok else None
+        if not token:
+            raise RuntimeError(f"Sign in failed for {row['username']}: {response.text}")
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+
+class Student(SignedInUser):
+    weight = 3
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        self.sign_in(random.choice(STUDENTS))
+
+    @task(3)
+    def dashboard(self):
+        self.client.get(f"{API}/user/dashboard/", headers=self.headers)
+
+    @task(2)
+    def whoami(self):
+        self.client.get(f"{API}/whoami/", headers=self.headers)
 
     @task(1)
-    def get_my_courses(self):
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = self.client.get("/mycourses", headers=headers)
-        if response.status_code == 200:
-            self.courses = response.json() 
-            # print("My Courses:", self.courses)
-            if self.courses:
-                self.course_id = self.courses[0]['course_id']['id']
-                self.get_course_contents(self.course_id)
-
-    def get_course_contents(self, course_id):
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = self.client.get(f"/courses/{course_id}/contents", headers=headers)
-        if response.status_code == 200:
-            self.contents = response.json() 
-            # print("Course Contents:", self.contents)
-            if self.contents:
-                self.content_id = self.contents[0]['id'] 
-                self.post_comment(self.content_id)
-
-    def post_comment(self, content_id):
-        headers = {"Authorization": f"Bearer {self.token}"}
-        comment_data = {"comment": "This is a test comment."}
-        response = self.client.post(f"/contents/{content_id}/comments", json=comment_data, headers=headers)
-        if response.status_code == 201:
-            self.comment_id = response.json().get("id")
-            # print("Comment posted:", response.json())
-            self.delete_comment(self.comment_id)
-
-    def delete_comment(self, comment_id):
-        headers = {"Authorization": f"Bearer {self.token}"}
-        response = self.client.delete(f"/comments/{comment_id}", headers=headers)
-        if response.status_code == 200:
-            print("Comment deleted:", response.json())
-        else:
-            print("Failed to delete comment:", response.text)
-
-class WebsiteUser(HttpUser):
-    tasks = [UserBehavior]
-    wait_time = between(1, 2) 
+    def comment(self):
+        content_id = random.randint(1, CONTENT_COUNT)
+        with self.client.post(f"{API}/contents/{content_id}/comment/?comment=load+test",
+                              headers=self.headers, name=f"{API}/contents/[id]/comment/",
+                              catch_response=True) as response:
+            # post_comment is throttled at 10/h per user
+            if response.status_code == 429:
+                response.success()
+
+    @task(1)
+    def feedback(self):
+        self.client.post(f"{API}/feedback/?course_id={random.choice(COURSES)}&feedback=load+test",
+                         headers=self.headers, name=f"{API}/feedback/")
+
+
+class Teacher(SignedInUser):
+    weight = 1
+    wait_time = between(2, 5)
+
+    def on_start(self):
+        self.teacher_id = random.choice(list(TEACHERS))
+        self.sign_in(self.teacher_id)
 
+    @task
+    def batch_enroll(self):
+        course_id = random.choice(TEACHERS[self.teacher_id])
+        payload = [{"course_id": course_id, "user_id": user_id} for user_id in random.sample(STUDENTS, 10)]
+        self.client.post(f"{API}/courses/batch_enroll/", json=payload, headers=self.headers)
@@ -0,0 +1,23 @@
+"""
+Seeds the database the API is using with the csv_data fixtures so that load
+test runs are comparable: same rows, same primary keys, same random comment
+authors. Run it against an empty database.
+
+    python load_test/seed.py
+"""
+import os
+import subprocess
+import sys
+
+CODE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code"))
+SEED = 42
+
+
+def main():
+    manage = [sys.executable, "manage.py"]
+    subprocess.run(manage + ["migrate", "--verbosity", "0"], cwd=CODE_DIR, check=True)
+    subprocess.run(manage + ["import_lms_data", "--seed", str(SEED)], cwd=CODE_DIR, check=True)
+
+
+if __name__ == "__main__":
+    main()